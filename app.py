@@ -1,6 +1,14 @@
+import json
 import streamlit as st
-import pandas as pd
-from utils import get_stock_data, format_table_data, calculate_pivot_points, get_tradingview_symbol, calculate_indicators
+import export
+from backtest import STRATEGIES, run_backtest
+from charting import build_price_chart
+from datacache import get_cache
+from indicators import PIVOT_METHODS
+from screener import run_screener
+from symbols import get_symbol_index
+from tracing import begin_trace, current_trace, span, count, metrics_json, metrics_text
+from utils import get_stock_data, format_table_data, calculate_pivot_points, get_pivot_points, get_indicators, get_nse_symbols, get_watchlist_data, get_histories, pivot_series, resample_ohlcv, interval_periods, bar_version, INTERVALS
 
 # Page configuration
 st.set_page_config(
@@ -10,6 +18,137 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Start this rerun's span tree; the debug panel (?debug=1) shows it
+begin_trace()
+
+# Seconds a fetched history is reused before the database/provider is asked again
+DATA_TTL_SECONDS = 300
+
+
+def cached_stage(name, loader, *args):
+    """Call a cached loader under a span, counting the lookup for hit rates"""
+    count('cache_lookups_total', cache=name)
+    with span(name):
+        return loader(*args)
+
+
+@st.cache_resource(ttl=DATA_TTL_SECONDS, max_entries=64, show_spinner=False)
+def load_stock_data(symbol, period, interval):
+    """Cached get_stock_data; errors raise so they are never cached"""
+    count('cache_misses_total', cache='stock_data')
+    hist, info, error = get_stock_data(symbol, period, interval)
+    if error:
+        raise RuntimeError(error)
+    return hist, info
+
+
+def data_version(hist):
+    """
+    Identifies a history by its last bar, values included, so derived caches roll
+    over with new data and with every update of a session still in progress
+    """
+    return bar_version(hist)
+
+
+# Frames are shared read-only between reruns and sessions, so cache_resource
+# avoids the copy that cache_data makes on every hit
+@st.cache_resource(max_entries=64, show_spinner=False)
+def load_indicators(symbol, period, version, _hist):
+    count('cache_misses_total', cache='indicators_frame')
+    return get_indicators(symbol, period, _hist)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_pivot_points(symbol, period, version, method, interval, _hist):
+    count('cache_misses_total', cache='pivots')
+    # Levels always come from daily bars, whatever interval is on screen;
+    # daily ones are precomputed by materialize.py
+    if interval == '1d':
+        return get_pivot_points(symbol, _hist, method)
+    return calculate_pivot_points(resample_ohlcv(_hist, 'D'), method)
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def load_chart(symbol, period, version, max_points, overlay, method, _hist):
+    count('cache_misses_total', cache='chart')
+    pivots = pivot_series(_hist, method, overlay) if overlay else None
+    return build_price_chart(_hist, f"{symbol.replace('.NS', '')} Stock Price Chart", max_points, pivots)
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def load_table(symbol, period, version, _hist):
+    count('cache_misses_total', cache='table')
+    return format_table_data(_hist)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_export(symbol, period, version, fmt, _df):
+    count('cache_misses_total', cache='export')
+    return export.export_frame(_df, fmt)
+
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, max_entries=8, show_spinner=False)
+def load_watchlist_bundle(symbols, period, fmt):
+    count('cache_misses_total', cache='watchlist_bundle')
+    frames, _ = get_histories(list(symbols), period)
+    return export.export_bundle(frames, fmt)
+
+
+@st.fragment
+def chart_section(symbol, period, version, hist):
+    """Chart controls only rerun this fragment"""
+    st.subheader("Price Chart with Technical Indicators")
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        max_points = st.select_slider("Chart detail (max candles)", options=[250, 500, 1000, 2000], value=2000)
+    with col2:
+        overlay = st.selectbox("Pivot overlay", options=[None, 'daily', 'weekly', 'monthly'],
+                               format_func=lambda tf: 'None' if tf is None else tf.capitalize())
+    with col3:
+        method = st.selectbox("Overlay method", options=PIVOT_METHODS, format_func=str.capitalize)
+    fig = cached_stage('chart', load_chart, symbol, period, version, max_points, overlay, method, hist)
+    with span('chart.render'):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+def table_section(symbol, period, version, hist):
+    """Table controls and downloads only rerun this fragment"""
+    st.subheader(f"Historical Data - {symbol.replace('.NS', '')}")
+    df = cached_stage('table', load_table, symbol, period, version, hist)
+    rows = st.selectbox("Rows", options=[100, 500, 'All'], index=0)
+    with span('table.render'):
+        st.dataframe(df if rows == 'All' else df.head(rows), use_container_width=True)
+
+    # Downloads are only serialised once asked for
+    fmt = st.selectbox("Export format", options=export.available_formats(), key="export_format")
+    request = (symbol, period, version, fmt)
+    if st.button("Prepare download"):
+        st.session_state['export_request'] = request
+    if st.session_state.get('export_request') == request:
+        st.download_button(
+            label=f"Download Data as {fmt.upper()}",
+            data=cached_stage('export', load_export, symbol, period, version, fmt, df),
+            file_name=export.file_name(f"{symbol.replace('.NS', '')}_stock_data", fmt),
+            mime=export.mime_type(fmt)
+        )
+
+
+def debug_panel():
+    """Span tree for this rerun plus exportable metrics, shown only with ?debug=1"""
+    if st.query_params.get('debug') != '1':
+        return
+    with st.sidebar.expander("Debug: timings", expanded=True):
+        trace = current_trace()
+        if trace is not None:
+            st.code(trace.format(), language=None)
+        st.json(metrics_json()['cache_hit_rates'])
+        st.json(get_cache().stats(), expanded=False)
+        st.download_button("Metrics (Prometheus)", metrics_text(), file_name="metrics.txt", mime="text/plain")
+        st.download_button("Metrics (JSON)", json.dumps(metrics_json(), indent=2),
+                           file_name="metrics.json", mime="application/json")
+
+
 # Hide Streamlit branding
 hide_st_style = """
 <style>
@@ -134,25 +273,159 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+view = st.sidebar.radio("View", ["Single Stock", "Watchlist", "Screener", "Backtest"])
+
+if view == "Backtest":
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        strategy = st.selectbox(
+            "Strategy",
+            options=STRATEGIES,
+            format_func=lambda s: {'supertrend': 'Long above supertrend', 'rsi': 'RSI mean reversion'}[s]
+        )
+    with col2:
+        bt_period = st.selectbox("Time Period", options=['1y', '2y', '5y'], index=2, key="backtest_period")
+    with col3:
+        fee_bps = st.number_input("Cost per side (bps)", min_value=0.0, value=5.0, step=1.0)
+    if strategy == 'rsi':
+        rsi_lower, rsi_upper = st.slider("Buy below / sell above RSI", 0, 100, (30, 70))
+    else:
+        rsi_lower, rsi_upper = 30, 70
+
+    with st.spinner('Backtesting symbols...'):
+        result, errors = run_backtest(list(get_nse_symbols()), bt_period, strategy, rsi_lower, rsi_upper, fee_bps)
+    st.dataframe(result.round(2), use_container_width=True)
+    for failed, message in errors.items():
+        st.warning(f"{failed}: {message}")
+    debug_panel()
+    st.stop()
+
+if view == "Screener":
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        query = st.text_input(
+            "Screen (columns: Close, change_pct, MA20, RSI, ATR, supertrend, bullish, R1, S1, "
+            "flipped_bullish, flipped_bearish, crossed_r1, crossed_s1, stale)",
+            "RSI < 30 or flipped_bullish"
+        )
+    with col2:
+        sort_by = st.selectbox("Rank by", options=['RSI', 'change_pct', 'ATR', 'Close'])
+
+    with st.spinner('Screening symbols...'):
+        try:
+            result, errors = run_screener(list(get_nse_symbols()), '1y', query or None, sort_by)
+        except Exception as e:
+            st.error(f"Invalid screen: {e}")
+            debug_panel()
+            st.stop()
+    st.dataframe(result.round(2), use_container_width=True)
+    for failed, message in errors.items():
+        st.warning(f"{failed}: {message}")
+    debug_panel()
+    st.stop()
+
+if view == "Watchlist":
+    nse_symbols = get_nse_symbols()
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        watchlist = st.multiselect(
+            "Watchlist",
+            options=list(nse_symbols),
+            default=list(nse_symbols),
+            format_func=lambda s: f"{s.replace('.NS', '')} - {nse_symbols[s]}"
+        )
+    with col2:
+        watch_period = st.selectbox(
+            "Time Period",
+            options=['1mo', '3mo', '6mo', '1y', '2y', '5y'],
+            index=1,
+            key="watchlist_period"
+        )
+
+    if watchlist:
+        with st.spinner(f'Fetching data for {len(watchlist)} symbols...'):
+            summary, errors = get_watchlist_data(watchlist, watch_period)
+        st.dataframe(
+            summary.style.map(
+                lambda trend: f"color: {'green' if trend == 'Bullish' else 'red'}",
+                subset=['Trend']
+            ),
+            use_container_width=True
+        )
+        for failed, message in errors.items():
+            st.warning(f"{failed}: {message}")
+
+        # Bulk export of every symbol's history, built only when asked for
+        bundle_format = st.selectbox("Archive format", options=export.available_formats(), key="bundle_format")
+        bundle_request = (tuple(watchlist), watch_period, bundle_format)
+        if st.button("Prepare watchlist archive"):
+            st.session_state['bundle_request'] = bundle_request
+        if st.session_state.get('bundle_request') == bundle_request:
+            with st.spinner('Building archive...'):
+                bundle = cached_stage('watchlist_bundle', load_watchlist_bundle, *bundle_request)
+            st.download_button(
+                label="Download Watchlist (.zip)",
+                data=bundle,
+                file_name=f"watchlist_{watch_period}_{bundle_format.replace('.', '_')}.zip",
+                mime="application/zip"
+            )
+    else:
+        st.info("👆 Pick at least one symbol for the watchlist")
+    debug_panel()
+    st.stop()
+
 # Input section
-col1, col2 = st.columns([2, 1])
+col1, col2, col3 = st.columns([2, 1, 1])
 with col1:
-    raw_symbol = st.text_input("Stock Symbol (e.g., RELIANCE, TCS, INFY)", "").upper()
-    symbol = f"{raw_symbol}.NS" if raw_symbol and not raw_symbol.endswith('.NS') else raw_symbol
+    raw_symbol = st.text_input("Stock Symbol (e.g., RELIANCE, TCS, INFY)", "").strip()
+    # Checked against the local listing, so a typo never turns into a network request.
+    # The bundled listing is partial, so until a full one is dropped in (python
+    # symbols.py --refresh) an unlisted symbol can still be looked up as typed
+    symbol_index = get_symbol_index()
+    symbol = symbol_index.resolve(raw_symbol) if raw_symbol else None
+    if raw_symbol and symbol is None:
+        options = [f"{listing.symbol}.NS" for listing in symbol_index.search(raw_symbol, limit=8)]
+        typed = f"{raw_symbol.upper().removesuffix('.NS')}.NS"
+        if not symbol_index.exhaustive:
+            options.append(typed)
+        if options:
+            symbol = st.selectbox(
+                "Did you mean",
+                options=options,
+                index=None if symbol_index.exhaustive else len(options) - 1,
+                placeholder=f"{raw_symbol.upper()} is not listed, pick a match",
+                format_func=lambda s: f"{s.replace('.NS', '')} - "
+                                      f"{symbol_index.get(s).name if symbol_index.get(s) else 'not in the local listing'}"
+            )
+        else:
+            st.error(f"{raw_symbol.upper()} is not a listed NSE symbol")
+
+with col3:
+    interval = st.selectbox("Interval", options=INTERVALS, index=0)
 
 with col2:
+    periods = interval_periods(interval)
     period = st.selectbox(
         "Time Period",
-        options=['1mo', '3mo', '6mo', '1y', '2y', '5y'],
-        index=3
+        options=periods,
+        index=periods.index('1y') if interval == '1d' else min(1, len(periods) - 1),
+        key=f"period_{interval}"
     )
 
 if symbol:
     # Add a loading spinner
     with st.spinner(f'Fetching data for {symbol}...'):
-        hist, info, error = get_stock_data(symbol, period)
+        try:
+            hist, info = cached_stage('stock_data', load_stock_data, symbol, period, interval)
+            error = None
+        except RuntimeError as e:
+            hist, info, error = None, None, str(e)
         if hist is not None:
-            hist = calculate_indicators(hist)  # Calculate all indicators including supertrend
+            version = data_version(hist)
+            # Derived caches below are keyed by period, so fold the interval into it
+            if interval != '1d':
+                period = f"{period}@{interval}"
+            hist = cached_stage('indicators_frame', load_indicators, symbol, period, version, hist)  # Computed once per symbol, period and last bar
 
     if error:
         st.error(f"Error fetching data: {error}")
@@ -169,8 +442,9 @@ if symbol:
         """, unsafe_allow_html=True)
 
         # Calculate and display pivot points
-        pivot_points = calculate_pivot_points(hist)
         st.markdown("<h3 style='margin-bottom: 20px; text-align: center;'>Support and Resistance levels for Intraday Trading</h3>", unsafe_allow_html=True)
+        pivot_method = st.radio("Pivot method", options=PIVOT_METHODS, format_func=str.capitalize, horizontal=True)
+        pivot_points = cached_stage('pivots', load_pivot_points, symbol, period, version, pivot_method, interval, hist)
 
         col1, col2, col3 = st.columns(3)
 
@@ -198,64 +472,13 @@ if symbol:
             st.markdown('</div></div>', unsafe_allow_html=True)
 
         # Display Interactive Price Chart
-        st.subheader("Price Chart with Technical Indicators")
-        
-        import plotly.graph_objects as go
-        from plotly.subplots import make_subplots
-        
-        # Create figure with secondary y-axis
-        fig = make_subplots(rows=2, cols=1, shared_xaxes=True, 
-                          vertical_spacing=0.03, row_heights=[0.7, 0.3])
-
-        # Add candlestick
-        fig.add_trace(go.Candlestick(x=hist.index,
-                                    open=hist['Open'],
-                                    high=hist['High'],
-                                    low=hist['Low'],
-                                    close=hist['Close'],
-                                    name='OHLC'),
-                     row=1, col=1)
-
-        # Add Moving average to price chart
-        ma20 = hist['Close'].rolling(window=20).mean()
-        fig.add_trace(go.Scatter(x=hist.index, y=ma20,
-                                line=dict(color='orange', width=2),
-                                name='MA20'),
-                     row=1, col=1)
-
-        # Add Volume chart
-        colors = ['red' if row['Open'] > row['Close'] else 'green' for index, row in hist.iterrows()]
-        fig.add_trace(go.Bar(x=hist.index, y=hist['Volume'],
-                            marker_color=colors,
-                            name='Volume'),
-                     row=2, col=1)
-
-        # Update layout
-        fig.update_layout(
-            xaxis_rangeslider_visible=False,
-            height=800,
-            template='plotly_dark',
-            title=f"{symbol.replace('.NS', '')} Stock Price Chart",
-            yaxis_title="Price (₹)",
-            yaxis2_title="Volume"
-        )
-
-        st.plotly_chart(fig, use_container_width=True)
+        chart_section(symbol, period, version, hist)
 
         # Historical data table
-        st.subheader(f"Historical Data - {symbol.replace('.NS', '')}")
-        df = format_table_data(hist)
-        st.dataframe(df, use_container_width=True)
-
-        # Download button
-        csv = df.to_csv()
-        st.download_button(
-            label="Download Data as CSV",
-            data=csv,
-            file_name=f"{symbol.replace('.NS', '')}_stock_data.csv",
-            mime="text/csv"
-        )
+        table_section(symbol, period, version, hist)
     else:
         st.error("No data found for the given symbol")
-else:
-    st.info("👆 Enter a stock symbol above to get started!")
\ No newline at end of file
+elif not raw_symbol:
+    st.info("👆 Enter a stock symbol above to get started!")
+
+debug_panel()
@@ -0,0 +1,150 @@
+"""
+Bulk backfill of daily history into the stock_prices table.
+
+    python backfill.py                         # whole NSE list, 5y
+    python backfill.py --period 2y TCS INFY    # selected symbols
+
+Symbols are downloaded in batches, each requested at once through the
+provider so the shared fetcher's rate limit and connection pool apply, and
+each batch is written through the configured price store (one transaction
+for SQLite). A symbol whose stored bars reach back over the whole period is
+only topped up from its last stored date, so an interrupted run picks up
+where it stopped; one with a shorter stored history gets the full period.
+A top-up that shows the provider has re-adjusted past bars (a split or
+dividend) re-downloads the whole period in place of everything stored.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from database import init_db, get_price_store
+from providers import get_provider, storage_key, readjusted, PERIOD_DAYS, SESSION_OPEN, SESSION_MINUTES
+from utils import cli_symbols, head_gap_days, _tail_start
+
+EXCHANGE_TZ = ZoneInfo('Asia/Kolkata')
+# Stored days read back before a top-up, enough to span any exchange holiday
+RECENT_DAYS = 14
+
+
+def _latest_session(now):
+    """Date of the last weekday session that has closed by `now` (naive exchange-local time)"""
+    opens = datetime.combine(now.date(), datetime.strptime(SESSION_OPEN, '%H:%M').time())
+    day = now.date() if now >= opens + timedelta(minutes=SESSION_MINUTES) else now.date() - timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def _is_current(last_date, now):
+    """True when the last stored bar is from the latest closed session"""
+    return last_date.date() >= _latest_session(now)
+
+
+def _has_head(first_date, period, now):
+    """True when stored bars reach back to the start of `period` (always for 'max')"""
+    days = PERIOD_DAYS.get(period)
+    return days is None or first_date <= now - timedelta(days=days - head_gap_days(period))
+
+
+def _fetch_batch(provider, batch, period):
+    """
+    Download a batch of (symbol, recent) pairs, where `recent` holds the last
+    stored bars or is None when the whole period is needed. Each kind of
+    request goes out as one `provider.histories` call.
+    Returns (frames, replace, failed): bars per symbol, the symbols whose bars
+    replace the stored ones, and symbol -> error message.
+    """
+    full = [symbol for symbol, recent in batch if recent is None]
+    tails = {}
+    for symbol, recent in batch:
+        if recent is not None:
+            tails.setdefault(_tail_start(recent), {})[symbol] = recent
+
+    frames = {}
+    failed = {}
+    replace = []
+    for start, group in tails.items():
+        fetched, errors = provider.histories(list(group), start=start)
+        failed.update(errors)
+        for symbol, tail in fetched.items():
+            if readjusted(group[symbol], tail):
+                replace.append(symbol)
+            else:
+                frames[symbol] = tail
+    if full or replace:
+        fetched, errors = provider.histories(full + replace, period=period)
+        failed.update(errors)
+        frames.update(fetched)
+    return frames, [symbol for symbol in replace if symbol in frames], failed
+
+
+def backfill(symbols, period='5y', batch_size=20, log=print):
+    """
+    Download and store history for `symbols`.
+    Returns a dict with rows written, elapsed seconds, skipped, re-adjusted and failed symbols.
+    """
+    init_db()
+    provider = get_provider()
+    store = get_price_store()
+    ranges = store.price_ranges([storage_key(symbol, provider) for symbol in symbols])
+    now = datetime.now(EXCHANGE_TZ).replace(tzinfo=None)
+
+    pending = []
+    skipped = []
+    for symbol in symbols:
+        first_date, last_date = ranges.get(storage_key(symbol, provider), (None, None))
+        if first_date is None or not _has_head(first_date, period, now):
+            # Nothing stored, or only a shorter window: fetch the whole period
+            pending.append((symbol, None))
+        elif _is_current(last_date, now):
+            skipped.append(symbol)
+        else:
+            recent = store.load_prices(storage_key(symbol, provider), last_date - timedelta(days=RECENT_DAYS))
+            pending.append((symbol, recent))
+    if skipped:
+        log(f"{len(skipped)} symbols already up to date")
+
+    rows = 0
+    failed = {}
+    readjusted_symbols = []
+    started = time.perf_counter()
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i:i + batch_size]
+        frames, replace, errors = _fetch_batch(provider, batch, period)
+        failed.update(errors)
+        written = 0
+        for symbol in replace:
+            # Nothing on the old basis may stay behind the new bars
+            readjusted_symbols.append(symbol)
+            written += store.replace_prices(storage_key(symbol, provider), frames.pop(symbol))
+        written += store.bulk_upsert_prices({storage_key(symbol, provider): hist for symbol, hist in frames.items()})
+        rows += written
+        elapsed = time.perf_counter() - started
+        log(f"[{min(i + batch_size, len(pending))}/{len(pending)}] "
+            f"{written} rows, {rows / elapsed if elapsed else 0:,.0f} rows/sec overall")
+
+    elapsed = time.perf_counter() - started
+    if readjusted_symbols:
+        log(f"Re-downloaded {len(readjusted_symbols)} symbols with re-adjusted history")
+    return {'rows': rows, 'seconds': elapsed, 'skipped': skipped, 'readjusted': readjusted_symbols,
+            'failed': failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill daily stock history into SQLite")
+    parser.add_argument('symbols', nargs='*', help="Symbols without .NS (default: the NSE list)")
+    parser.add_argument('--period', default='5y', help="History to fetch for new symbols")
+    parser.add_argument('--batch-size', type=int, default=20, help="Symbols per write transaction")
+    args = parser.parse_args()
+
+    symbols = cli_symbols(args.symbols)
+
+    result = backfill(symbols, args.period, args.batch_size)
+    rate = result['rows'] / result['seconds'] if result['seconds'] else 0
+    print(f"Wrote {result['rows']:,} rows in {result['seconds']:.1f}s ({rate:,.0f} rows/sec)")
+    for symbol, error in result['failed'].items():
+        print(f"Failed {symbol}: {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Vectorised backtests of the dashboard's supertrend and RSI signals.
+
+Signals come from the indicator columns produced by `calculate_indicators`
+(or `screener.compute_panel` for many symbols). Everything is computed on
+(bars x symbols) arrays: positions by forward-filling entry/exit events,
+per-trade P&L with `np.bincount` over trade ids, so there is no loop over
+bars or trades. Large universes are split into column chunks on a process
+pool, like the screener.
+"""
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import indicators
+from screener import CHUNK_SIZE, PARALLEL_MIN_SYMBOLS, build_panel, compute_panel
+
+STRATEGIES = ['supertrend', 'rsi']
+
+# Result columns, one row per symbol
+METRIC_COLUMNS = ['total_return_pct', 'max_drawdown_pct', 'trades', 'hit_rate_pct',
+                  'avg_trade_pct', 'exposure_pct']
+
+
+def _as_2d(values):
+    values = np.asarray(values, dtype=float)
+    return values[:, None] if values.ndim == 1 else values
+
+
+def _hold(entry, exit):
+    """
+    Long (1.0) from an entry bar until the next exit bar, flat otherwise.
+    A bar that is both an entry and an exit counts as an exit.
+    """
+    n = len(entry)
+    rows = np.arange(n)[:, None]
+    last_entry = np.maximum.accumulate(np.where(entry & ~exit, rows, -1), axis=0)
+    last_exit = np.maximum.accumulate(np.where(exit, rows, -1), axis=0)
+    return (last_entry > last_exit).astype(float)
+
+
+def signals(close, supertrend=None, rsi=None, strategy='supertrend', rsi_lower=30, rsi_upper=70):
+    """
+    Desired position (1 long, 0 flat) at the close of each bar.
+    'supertrend' is long while the close is above the supertrend line;
+    'rsi' buys when RSI drops below `rsi_lower` and sells when it rises above `rsi_upper`.
+    """
+    close = _as_2d(close)
+    if strategy == 'supertrend':
+        supertrend = _as_2d(supertrend)
+        # The supertrend is 0.0 during its warm-up; stay flat there
+        return ((close > supertrend) & (supertrend > 0)).astype(float)
+    if strategy == 'rsi':
+        rsi = _as_2d(rsi)
+        return _hold(rsi < rsi_lower, rsi > rsi_upper)
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def evaluate(close, position, fee_bps=0.0):
+    """
+    Metrics for holding `position` (decided at each close, held over the next bar).
+    `close` and `position` are (bars x symbols). Returns a dict of metric -> array
+    per symbol, plus 'equity' (bars x symbols).
+    """
+    close = _as_2d(close)
+    position = _as_2d(position)
+    n, m = close.shape
+
+    returns = np.zeros((n, m))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = close[1:] / close[:-1] - 1
+    # Gaps against a shared calendar earn nothing
+    returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+    held = np.zeros((n, m))
+    held[1:] = position[:-1]
+    previous = np.zeros((n, m))
+    previous[1:] = held[:-1]
+    strategy_returns = held * returns - np.abs(held - previous) * fee_bps / 10_000
+
+    log_returns = np.log1p(strategy_returns)
+    equity = np.exp(np.cumsum(log_returns, axis=0))
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+
+    # Number the trades of all symbols consecutively and sum each trade's log return,
+    # including the bar it is closed on, which carries the exit fee
+    entries = (held > 0) & (previous == 0)
+    trades_per_symbol = entries.sum(axis=0)
+    offsets = np.concatenate([[0], np.cumsum(trades_per_symbol)[:-1]])
+    trade_ids = np.cumsum(entries, axis=0) + offsets - 1
+    in_trade = held > 0
+    in_or_closing = in_trade | ((held == 0) & (previous > 0))
+    total_trades = int(trades_per_symbol.sum())
+    trade_pnl = np.expm1(np.bincount(trade_ids[in_or_closing], weights=log_returns[in_or_closing],
+                                     minlength=total_trades))
+    trade_symbol = np.repeat(np.arange(m), trades_per_symbol)
+    wins = np.bincount(trade_symbol, weights=trade_pnl > 0, minlength=m)
+    pnl_sum = np.bincount(trade_symbol, weights=trade_pnl, minlength=m)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hit_rate = np.where(trades_per_symbol > 0, wins / trades_per_symbol, np.nan)
+        avg_trade = np.where(trades_per_symbol > 0, pnl_sum / trades_per_symbol, np.nan)
+    return {
+        'total_return_pct': (equity[-1] - 1) * 100 if n else np.full(m, np.nan),
+        'max_drawdown_pct': drawdown.min(axis=0) * 100 if n else np.full(m, np.nan),
+        'trades': trades_per_symbol,
+        'hit_rate_pct': hit_rate * 100,
+        'avg_trade_pct': avg_trade * 100,
+        'exposure_pct': in_trade.mean(axis=0) * 100 if n else np.full(m, np.nan),
+        'equity': equity,
+    }
+
+
+def _backtest_chunk(close, supertrend, rsi, strategy, rsi_lower, rsi_upper, fee_bps):
+    position = signals(close, supertrend, rsi, strategy, rsi_lower, rsi_upper)
+    metrics = evaluate(close, position, fee_bps)
+    return {name: metrics[name] for name in METRIC_COLUMNS}
+
+
+def backtest(df, strategy='supertrend', rsi_lower=30, rsi_upper=70, fee_bps=0.0):
+    """
+    Backtest one symbol from a `calculate_indicators` frame.
+    Returns (metrics, equity): a dict of METRIC_COLUMNS and the equity curve as a Series.
+    """
+    position = signals(df['Close'], df['supertrend'], df['RSI'], strategy, rsi_lower, rsi_upper)
+    metrics = evaluate(df['Close'], position, fee_bps)
+    equity = pd.Series(metrics.pop('equity')[:, 0], index=df.index, name='equity')
+    return {name: metrics[name][0].item() for name in METRIC_COLUMNS}, equity
+
+
+def grid_search(df, periods, multipliers, fee_bps=0.0):
+    """
+    Backtest the supertrend strategy of one symbol for every (period, multiplier)
+    pair, computed together with `indicators.IndicatorGrid`.
+    Returns a DataFrame indexed by (period, multiplier) with METRIC_COLUMNS.
+    """
+    grid = indicators.IndicatorGrid(df['High'], df['Low'], df['Close'])
+    trend = grid.supertrend(periods, multipliers)
+    combos = trend.reshape(-1, trend.shape[-1]).T                  # (bars x combos)
+    close = np.repeat(df['Close'].to_numpy(dtype=float)[:, None], combos.shape[1], axis=1)
+    metrics = _backtest_chunk(close, combos, None, 'supertrend', 30, 70, fee_bps)
+    index = pd.MultiIndex.from_product([list(periods), list(multipliers)], names=['period', 'multiplier'])
+    return pd.DataFrame(metrics, index=index)
+
+
+def backtest_panel(panel, computed, strategy='supertrend', rsi_lower=30, rsi_upper=70,
+                   fee_bps=0.0, max_workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Backtest every symbol of a screener panel (`build_panel` / `compute_panel` output).
+    Returns a DataFrame indexed by symbol with METRIC_COLUMNS.
+    """
+    close = panel['Close'].to_numpy(dtype=float)
+    supertrend = computed['supertrend'].to_numpy(dtype=float)
+    rsi = computed['RSI'].to_numpy(dtype=float)
+    n_symbols = close.shape[1]
+    options = (strategy, rsi_lower, rsi_upper, fee_bps)
+
+    if n_symbols < PARALLEL_MIN_SYMBOLS and max_workers is None:
+        results = [_backtest_chunk(close, supertrend, rsi, *options)]
+    else:
+        bounds = range(0, n_symbols, chunk_size)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_backtest_chunk, close[:, i:i + chunk_size],
+                                   supertrend[:, i:i + chunk_size], rsi[:, i:i + chunk_size], *options)
+                       for i in bounds]
+            results = [future.result() for future in futures]
+
+    result = pd.DataFrame({name: np.concatenate([r[name] for r in results]) for name in METRIC_COLUMNS},
+                          index=panel['Close'].columns)
+    result.index.name = 'Symbol'
+    return result
+
+
+def run_backtest(symbols, period='5y', strategy='supertrend', rsi_lower=30, rsi_upper=70, fee_bps=0.0):
+    """Load `symbols`, compute their indicators and backtest them. Returns (result, errors)"""
+    from utils import get_histories
+    frames, errors = get_histories(symbols, period)
+    if not frames:
+        return pd.DataFrame(columns=METRIC_COLUMNS), errors
+    panel = build_panel(frames)
+    result = backtest_panel(panel, compute_panel(panel), strategy, rsi_lower, rsi_upper, fee_bps)
+    return result, errors
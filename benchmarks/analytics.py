@@ -0,0 +1,178 @@
+"""
+Benchmark suite for the analytics in utils.py and the price store.
+
+Runs fully offline on generated OHLCV and records, per case and size:
+best wall time, peak traced memory and the number of memory blocks left
+allocated. Results are written as JSON so runs from different commits
+can be compared.
+
+    python -m benchmarks.analytics                       # all sizes
+    python -m benchmarks.analytics --sizes 250 10000     # quick run
+    python -m benchmarks.analytics --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SIZES = [250, 10_000, 100_000, 1_000_000]
+# SQLite writes are far slower than everything else; skip it above this size
+SQLITE_MAX_SIZE = 100_000
+
+
+def synthetic_ohlcv(n, seed=0):
+    """Random-walk OHLCV with a minute index, so any size fits in datetime64"""
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    open_ = close * (1 + rng.normal(0, 0.0005, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0005, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0005, n)))
+    volume = rng.integers(1_000, 100_000, n)
+    index = pd.date_range('2010-01-01', periods=n, freq='min', name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low,
+                         'Close': close, 'Volume': volume}, index=index)
+
+
+def measure(func, repeat):
+    """Best wall time over `repeat` runs, then one traced run for memory"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    del result
+    return {'seconds': min(times), 'peak_bytes': peak, 'alloc_blocks': blocks}
+
+
+def cases(size, workdir):
+    """(name, callable) pairs for one input size"""
+    import utils
+    from columnar import ColumnarPriceStore
+
+    hist = synthetic_ohlcv(size)
+    with_indicators = utils.calculate_indicators(hist.copy())
+
+    yield 'calculate_indicators', lambda: utils.calculate_indicators(hist.copy())
+    yield 'calculate_indicators.lean', lambda: utils.calculate_indicators(hist, lean=True)
+    yield 'calculate_indicators.f32', lambda: utils.calculate_indicators(hist, lean=True, dtype='float32')
+    yield 'format_table_data', lambda: utils.format_table_data(with_indicators)
+    yield 'calculate_pivot_points', lambda: utils.calculate_pivot_points(with_indicators)
+
+    store = ColumnarPriceStore(os.path.join(workdir, f"columnar_{size}"))
+    store.upsert_prices('BENCH', hist)
+    yield 'columnar.upsert_prices', lambda: store.upsert_prices('BENCH', hist)
+    yield 'columnar.load_prices', lambda: store.load_prices('BENCH')
+
+    if size <= SQLITE_MAX_SIZE:
+        import database
+        database.ensure_db()
+        sqlite_store = database.SQLitePriceStore()
+        symbol = f"BENCH{size}"
+        sqlite_store.upsert_prices(symbol, hist)
+        yield 'sqlite.upsert_prices', lambda: sqlite_store.upsert_prices(symbol, hist)
+        yield 'sqlite.load_prices', lambda: sqlite_store.load_prices(symbol)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+
+def run(sizes, repeat, log=print):
+    """Run every case for every size and return the result document"""
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # database.py opens stock_data.db relative to the working directory
+        os.chdir(workdir)
+        try:
+            for size in sizes:
+                for name, func in cases(size, workdir):
+                    stats = measure(func, repeat if size < 1_000_000 else 1)
+                    results.append({'case': name, 'size': size, **stats})
+                    log(f"{name:26s} {size:>9,d}  {stats['seconds'] * 1000:10.2f} ms  "
+                        f"peak {stats['peak_bytes'] / 2**20:8.1f} MiB  blocks {stats['alloc_blocks']:>8,d}")
+        finally:
+            os.chdir(cwd)
+            import database
+            database.engine.dispose()
+    return {
+        'commit': _git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print time ratios against a baseline; return the regressed cases"""
+    previous = {(r['case'], r['size']): r for r in baseline['results']}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit', '?')} (threshold {threshold:.0%})")
+    for r in current['results']:
+        old = previous.get((r['case'], r['size']))
+        if old is None or not old['seconds']:
+            continue
+        ratio = r['seconds'] / old['seconds']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(r)
+        print(f"{r['case']:26s} {r['size']:>9,d}  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analytics and data access")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case (best is kept)")
+    parser.add_argument('--output', help="Result file (default benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="Baseline result file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown before failing")
+    args = parser.parse_args()
+
+    document = run(args.sizes, args.repeat)
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"{document['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(document, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Cold-start benchmark for the dashboard.
+
+Each run starts a fresh Python process, renders app.py once with
+Streamlit's AppTest harness and reports how long the process took from
+start to the first rendered page. Uses the synthetic provider, so no
+network is needed.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --symbol RELIANCE --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child process; prints its timings as JSON
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t_streamlit = time.perf_counter()
+at = AppTest.from_file('app.py', default_timeout=120)
+at.run()
+t_first = time.perf_counter()
+if at.exception:
+    sys.exit(f"First render failed: {at.exception[0].message}")
+t_symbol = None
+if sys.argv[1]:
+    at.text_input[0].input(sys.argv[1]).run()
+    if at.exception:
+        sys.exit(f"Symbol render failed: {at.exception[0].message}")
+    t_symbol = time.perf_counter()
+print(json.dumps({
+    'import_streamlit': t_streamlit - t0,
+    'first_render': t_first - t_streamlit,
+    'symbol_render': None if t_symbol is None else t_symbol - t_first,
+    'in_process': t_first - t0,
+}))
+"""
+
+
+def run_once(symbol=''):
+    """Start one process and return its timings, including total wall time to first page"""
+    env = dict(os.environ, MARKET_DATA_PROVIDER=os.environ.get('MARKET_DATA_PROVIDER', 'synthetic'))
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', CHILD, symbol], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "child failed")
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    # Interpreter start-up is everything the child did not measure itself
+    timings['process_to_first_page'] = time.perf_counter() - started - (timings['symbol_render'] or 0)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure process start to first rendered page")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--symbol', default='', help="Also time rendering this symbol")
+    parser.add_argument('--json', action='store_true', help="Print raw results as JSON")
+    args = parser.parse_args()
+
+    runs = [run_once(args.symbol) for _ in range(args.runs)]
+    if args.json:
+        print(json.dumps(runs, indent=2))
+        return
+    for key in runs[0]:
+        values = [r[key] for r in runs if r[key] is not None]
+        if values:
+            print(f"{key:24s} median {statistics.median(values) * 1000:8.1f} ms   "
+                  f"min {min(values) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
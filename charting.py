@@ -0,0 +1,182 @@
+"""
+Server-side preparation of the price chart.
+
+Long histories are rolled up into coarser candles and the overlay lines
+are thinned with LTTB (Largest-Triangle-Three-Buckets), so the Plotly
+payload stays bounded whatever period is selected.
+"""
+import numpy as np
+import pandas as pd
+from utils import resample_ohlcv
+
+MAX_CHART_POINTS = 2000
+
+# Pivot levels drawn when a pivot overlay is requested, with their colours
+OVERLAY_LEVELS = {
+    'Resistance 2': 'rgba(0, 200, 83, 0.5)',
+    'Resistance 1': 'rgba(0, 200, 83, 0.9)',
+    'Pivot Point': 'rgba(255, 255, 255, 0.8)',
+    'Support 1': 'rgba(255, 82, 82, 0.9)',
+    'Support 2': 'rgba(255, 82, 82, 0.5)',
+}
+
+# Candle sizes tried in order, with their approximate span
+RESAMPLE_LADDER = [
+    ('1min', pd.Timedelta(minutes=1)),
+    ('5min', pd.Timedelta(minutes=5)),
+    ('15min', pd.Timedelta(minutes=15)),
+    ('1h', pd.Timedelta(hours=1)),
+    ('4h', pd.Timedelta(hours=4)),
+    ('D', pd.Timedelta(days=1)),
+    ('W', pd.Timedelta(weeks=1)),
+    ('ME', pd.Timedelta(days=30)),
+    ('QE', pd.Timedelta(days=91)),
+    ('YE', pd.Timedelta(days=365)),
+]
+
+
+def lttb(x, y, n_out):
+    """
+    Downsample a line to `n_out` points with Largest-Triangle-Three-Buckets.
+    `x` must be numeric (datetimes as int64). Returns the selected indices.
+    NaN points are dropped before sampling.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(~np.isnan(y))
+    n = len(valid)
+    if n_out >= n or n_out < 3:
+        return valid
+    xv = x[valid]
+    yv = y[valid]
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket is the third corner of the triangle
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        next_x = xv[next_lo:next_hi].mean()
+        next_y = yv[next_lo:next_hi].mean()
+        area = np.abs((xv[prev] - next_x) * (yv[lo:hi] - yv[prev])
+                      - (xv[prev] - xv[lo:hi]) * (next_y - yv[prev]))
+        prev = lo + int(np.argmax(area))
+        selected[i + 1] = prev
+    return valid[selected]
+
+
+def candle_rule(index, max_points=MAX_CHART_POINTS):
+    """
+    Smallest candle size that brings `index` down to `max_points` candles,
+    or None when the data already fits.
+    """
+    if len(index) <= max_points:
+        return None
+    span = index[-1] - index[0]
+    spacing = pd.Series(index).diff().median()
+    for rule, width in RESAMPLE_LADDER:
+        if width > spacing and span / width <= max_points:
+            return rule
+    return RESAMPLE_LADDER[-1][0]
+
+
+def step_points(index, values, max_points=MAX_CHART_POINTS):
+    """
+    Indices of a piecewise-constant series where its value changes, which is
+    all a step line needs; thinned with LTTB if there are still too many.
+    """
+    values = np.asarray(values, dtype=float)
+    changed = np.ones(len(values), dtype=bool)
+    changed[1:] = (values[1:] != values[:-1]) & ~(np.isnan(values[1:]) & np.isnan(values[:-1]))
+    if len(values):
+        changed[-1] = True
+    keep = np.flatnonzero(changed & ~np.isnan(values))
+    if len(keep) > max_points:
+        keep = keep[lttb(index.asi8[keep], values[keep], max_points)]
+    return keep
+
+
+def prepare_chart_data(hist, max_points=MAX_CHART_POINTS, pivots=None):
+    """
+    Bound the chart payload to about `max_points` candles.
+    Returns a dict with 'candles' (OHLCV frame), 'colors' (volume bar colours),
+    'ma_x'/'ma_y' (MA20 overlay), 'rule' (candle size used, None if unchanged)
+    and 'levels' (name -> (x, y) step lines from the `pivots` frame, if given).
+    """
+    rule = candle_rule(hist.index, max_points)
+    candles = resample_ohlcv(hist, rule) if rule else hist
+
+    # MA20 stays computed on the original bars and is thinned separately
+    ma = hist['MA20'] if 'MA20' in hist.columns else hist['Close'].rolling(20).mean()
+    keep = lttb(hist.index.asi8, ma.to_numpy(), max_points)
+
+    levels = {}
+    if pivots is not None:
+        for name in OVERLAY_LEVELS:
+            values = pivots[name].to_numpy()
+            points = step_points(pivots.index, values, max_points)
+            levels[name] = (pivots.index[points], values[points])
+
+    return {
+        'candles': candles,
+        'colors': np.where(candles['Open'] > candles['Close'], 'red', 'green'),
+        'ma_x': hist.index[keep],
+        'ma_y': ma.to_numpy()[keep],
+        'rule': rule,
+        'levels': levels,
+    }
+
+
+def build_price_chart(hist, title, max_points=MAX_CHART_POINTS, pivots=None):
+    """Candlestick, MA20 and volume figure for `hist`, with optional historical pivot levels"""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    data = prepare_chart_data(hist, max_points, pivots)
+    candles = data['candles']
+
+    # Create figure with secondary y-axis
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True,
+                        vertical_spacing=0.03, row_heights=[0.7, 0.3])
+
+    # Add candlestick
+    fig.add_trace(go.Candlestick(x=candles.index,
+                                 open=candles['Open'],
+                                 high=candles['High'],
+                                 low=candles['Low'],
+                                 close=candles['Close'],
+                                 name='OHLC' if data['rule'] is None else f"OHLC ({data['rule']})"),
+                  row=1, col=1)
+
+    # Add Moving average to price chart
+    fig.add_trace(go.Scatter(x=data['ma_x'], y=data['ma_y'],
+                             line=dict(color='orange', width=2),
+                             name='MA20'),
+                  row=1, col=1)
+
+    # Historical pivot levels as step lines
+    for name, (x, y) in data['levels'].items():
+        fig.add_trace(go.Scatter(x=x, y=y, mode='lines', line_shape='hv',
+                                 line=dict(color=OVERLAY_LEVELS[name], width=1, dash='dot'),
+                                 name=name),
+                      row=1, col=1)
+
+    # Add Volume chart
+    fig.add_trace(go.Bar(x=candles.index, y=candles['Volume'],
+                         marker_color=data['colors'],
+                         name='Volume'),
+                  row=2, col=1)
+
+    # Update layout
+    fig.update_layout(
+        xaxis_rangeslider_visible=False,
+        height=800,
+        template='plotly_dark',
+        title=title,
+        yaxis_title="Price (₹)",
+        yaxis2_title="Volume"
+    )
+    return fig
@@ -0,0 +1,123 @@
+"""
+Columnar price storage: one directory per symbol holding a contiguous
+`.npy` array per field. Arrays are opened with `np.load(mmap_mode='r')`,
+so loading a date range is a binary search plus zero-copy slices of the
+mapped files instead of one Python object per bar.
+"""
+import os
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+
+FIELDS = {
+    'Open': np.float64,
+    'High': np.float64,
+    'Low': np.float64,
+    'Close': np.float64,
+    'Volume': np.int64,
+}
+
+
+class ColumnarPriceStore:
+    """Price store backed by memory-mapped NumPy files under `root`"""
+
+    def __init__(self, root='price_data'):
+        self.root = root
+        self._lock = threading.RLock()
+
+    def _dir(self, symbol):
+        # ':' separates provider prefixes in storage keys and is not portable in paths
+        return os.path.join(self.root, symbol.replace(':', '__'))
+
+    def load_arrays(self, symbol, start=None, end=None):
+        """
+        Return a dict of field -> array for bars in [start, end], plus 'Date'
+        as datetime64[ns]. Arrays are read-only views of the mapped files.
+        Returns None if nothing is stored for the symbol.
+        """
+        path = self._dir(symbol)
+        if not os.path.exists(os.path.join(path, 'Date.npy')):
+            return None
+        with self._lock:
+            dates = np.load(os.path.join(path, 'Date.npy'), mmap_mode='r')
+            columns = {field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode='r')
+                       for field in FIELDS}
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'ns'), 'left')
+        hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end), 'ns'), 'right')
+        # Plain ndarray views over the mapping, so pandas treats them like any array
+        arrays = {field: values[lo:hi].view(np.ndarray) for field, values in columns.items()}
+        arrays['Date'] = dates[lo:hi].view(np.ndarray)
+        return arrays
+
+    def load_prices(self, symbol, start=None, end=None):
+        """Same contract as `database.load_prices`"""
+        arrays = self.load_arrays(symbol, start, end)
+        if arrays is None:
+            return pd.DataFrame(columns=list(FIELDS), index=pd.DatetimeIndex([], name='Date'))
+        index = pd.DatetimeIndex(arrays.pop('Date'), name='Date')
+        return pd.DataFrame(arrays, index=index, copy=False)
+
+    def upsert_prices(self, symbol, df):
+        """Same contract as `database.upsert_prices`"""
+        if df.empty:
+            return 0
+        new = self._arrays(df)
+        with self._lock:
+            existing = self.load_arrays(symbol)
+            if existing is not None:
+                keep = ~np.isin(existing['Date'], new['Date'])
+                merged = {k: np.concatenate([existing[k][keep], new[k]]) for k in new}
+                order = np.argsort(merged['Date'], kind='stable')
+                merged = {k: v[order] for k, v in merged.items()}
+            else:
+                merged = new
+            self._write(symbol, merged)
+        return len(df)
+
+    def replace_prices(self, symbol, df):
+        """Same contract as `database.replace_prices`"""
+        with self._lock:
+            if df.empty:
+                shutil.rmtree(self._dir(symbol), ignore_errors=True)
+            else:
+                self._write(symbol, self._arrays(df))
+        return len(df)
+
+    def bulk_upsert_prices(self, frames):
+        """Same contract as `database.bulk_upsert_prices`; one symbol directory is swapped at a time"""
+        return sum(self.upsert_prices(symbol, df) for symbol, df in frames.items())
+
+    def price_ranges(self, symbols):
+        """Same contract as `database.price_ranges`"""
+        ranges = {}
+        for symbol in symbols:
+            path = os.path.join(self._dir(symbol), 'Date.npy')
+            if os.path.exists(path):
+                with self._lock:
+                    dates = np.load(path, mmap_mode='r')
+                if len(dates):
+                    ranges[symbol] = (pd.Timestamp(dates[0]), pd.Timestamp(dates[-1]))
+        return ranges
+
+    def _arrays(self, df):
+        df = df.sort_index()
+        arrays = {'Date': df.index.values.astype('datetime64[ns]')}
+        for field, dtype in FIELDS.items():
+            values = df[field].fillna(0) if field == 'Volume' else df[field]
+            arrays[field] = values.to_numpy(dtype=dtype)
+        return arrays
+
+    def _write(self, symbol, arrays):
+        # Write a complete new directory, then swap it in
+        path = self._dir(symbol)
+        tmp = f"{path}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, values in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(values))
+        old = f"{path}.old"
+        if os.path.exists(path):
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
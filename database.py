@@ -1,30 +1,41 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Index
+from sqlalchemy import create_engine, event, inspect, text, func, Column, Integer, String, Float, DateTime, Text, select
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
+import json
+import os
+import threading
+import pandas as pd
 
 # Create database engine
 engine = create_engine('sqlite:///stock_data.db', echo=False)
 Base = declarative_base()
 Session = sessionmaker(bind=engine)
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the backfill writer"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=10000")
+    cursor.close()
+
 class StockPrice(Base):
     """Model for storing historical stock prices"""
     __tablename__ = 'stock_prices'
     
-    id = Column(Integer, primary_key=True)
-    symbol = Column(String, nullable=False)
-    date = Column(DateTime, nullable=False)
+    # (symbol, date) is the clustered key: rows are stored in that order
+    symbol = Column(String, primary_key=True)
+    date = Column(DateTime, primary_key=True)
     open = Column(Float)
     high = Column(Float)
     low = Column(Float)
     close = Column(Float)
     volume = Column(Integer)
     
-    # Index for faster queries
-    __table_args__ = (
-        Index('idx_symbol_date', 'symbol', 'date'),
-    )
+    __table_args__ = {'sqlite_with_rowid': False}
 
 class StockInfo(Base):
     """Model for storing company information"""
@@ -38,10 +49,354 @@ class StockInfo(Base):
     market_cap = Column(Float)
     last_updated = Column(DateTime, default=datetime.utcnow)
 
+class IndicatorState(Base):
+    """Model for storing streaming indicator state per symbol"""
+    __tablename__ = 'indicator_state'
+
+    symbol = Column(String, primary_key=True)
+    last_date = Column(DateTime, nullable=False)
+    state = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class DailyIndicator(Base):
+    """Model for indicators precomputed per daily bar by materialize.py"""
+    __tablename__ = 'daily_indicators'
+
+    symbol = Column(String, primary_key=True)
+    date = Column(DateTime, primary_key=True)
+    ma20 = Column(Float)
+    rsi = Column(Float)
+    supertrend = Column(Float)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class PivotLevel(Base):
+    """Model for pivot levels derived from each daily bar, for the session after it"""
+    __tablename__ = 'pivot_levels'
+
+    # (symbol, method, date) so the latest levels for a method are one index seek
+    symbol = Column(String, primary_key=True)
+    method = Column(String, primary_key=True)
+    date = Column(DateTime, primary_key=True)
+    pivot = Column(Float)
+    r1 = Column(Float)
+    r2 = Column(Float)
+    r3 = Column(Float)
+    r4 = Column(Float)
+    s1 = Column(Float)
+    s2 = Column(Float)
+    s3 = Column(Float)
+    s4 = Column(Float)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
 def init_db():
     """Initialize the database by creating all tables"""
+    _migrate_stock_prices()
     Base.metadata.create_all(engine)
 
+_initialized = False
+_init_lock = threading.Lock()
+
+def ensure_db():
+    """Run init_db once per process, on first use"""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if not _initialized:
+            init_db()
+            _initialized = True
+
+def _migrate_stock_prices():
+    """
+    Move a stock_prices table from the old id-keyed layout to the
+    (symbol, date) WITHOUT ROWID layout, keeping the newest row per bar.
+    """
+    columns = [c['name'] for c in inspect(engine).get_columns('stock_prices')] \
+        if inspect(engine).has_table('stock_prices') else []
+    if 'id' not in columns:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE stock_prices RENAME TO stock_prices_old"))
+        conn.execute(text("DROP INDEX IF EXISTS idx_symbol_date"))
+        StockPrice.__table__.create(conn)
+        conn.execute(text(
+            "INSERT OR REPLACE INTO stock_prices (symbol, date, open, high, low, close, volume) "
+            "SELECT symbol, date, open, high, low, close, volume FROM stock_prices_old ORDER BY id"
+        ))
+        conn.execute(text("DROP TABLE stock_prices_old"))
+
 def get_session():
     """Get a new database session"""
     return Session()
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+def load_prices(symbol, start=None, end=None):
+    """
+    Load stored daily bars for a symbol between `start` and `end`, oldest first.
+    Returns an OHLCV DataFrame indexed by date (empty if nothing is stored).
+    """
+    query = select(
+        StockPrice.date.label('Date'),
+        StockPrice.open.label('Open'),
+        StockPrice.high.label('High'),
+        StockPrice.low.label('Low'),
+        StockPrice.close.label('Close'),
+        StockPrice.volume.label('Volume'),
+    ).where(StockPrice.symbol == symbol)
+    if start is not None:
+        query = query.where(StockPrice.date >= pd.Timestamp(start).to_pydatetime())
+    if end is not None:
+        query = query.where(StockPrice.date <= pd.Timestamp(end).to_pydatetime())
+    query = query.order_by(StockPrice.date)
+
+    with get_session() as session:
+        rows = session.execute(query).all()
+    df = pd.DataFrame(rows, columns=['Date'] + PRICE_COLUMNS)
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df.set_index('Date')
+
+def _price_records(symbol, df):
+    volume = df['Volume'].fillna(0).astype('int64')
+    return [
+        {'symbol': symbol, 'date': date, 'open': open_, 'high': high,
+         'low': low, 'close': close, 'volume': vol}
+        for date, open_, high, low, close, vol in zip(
+            df.index.to_pydatetime(), df['Open'].tolist(), df['High'].tolist(),
+            df['Low'].tolist(), df['Close'].tolist(), volume.tolist())
+    ]
+
+_price_upsert = sqlite_insert(StockPrice)
+_price_upsert = _price_upsert.on_conflict_do_update(
+    index_elements=['symbol', 'date'],
+    set_={name: _price_upsert.excluded[name] for name in ('open', 'high', 'low', 'close', 'volume')},
+)
+
+def upsert_prices(symbol, df):
+    """
+    Store daily bars for a symbol, replacing any rows already stored
+    for the same dates. `df` is an OHLCV frame indexed by naive dates.
+    """
+    return bulk_upsert_prices({symbol: df})
+
+def bulk_upsert_prices(frames):
+    """
+    Upsert bars for many symbols ({symbol: frame}) in a single transaction
+    using one executemany call. Returns the number of rows written.
+    """
+    records = []
+    for symbol, df in frames.items():
+        if not df.empty:
+            records.extend(_price_records(symbol, df))
+    if not records:
+        return 0
+    with engine.begin() as conn:
+        conn.execute(_price_upsert, records)
+    return len(records)
+
+def replace_prices(symbol, df):
+    """Drop every stored bar for a symbol and store `df` instead, in one transaction"""
+    records = _price_records(symbol, df) if not df.empty else []
+    with engine.begin() as conn:
+        conn.execute(StockPrice.__table__.delete().where(StockPrice.symbol == symbol))
+        if records:
+            conn.execute(_price_upsert, records)
+    return len(records)
+
+def last_price_dates():
+    """Return {symbol: last stored bar date} for every stored symbol"""
+    query = select(StockPrice.symbol, func.max(StockPrice.date)).group_by(StockPrice.symbol)
+    with get_session() as session:
+        return {symbol: pd.Timestamp(last) for symbol, last in session.execute(query)}
+
+def price_ranges(symbols=None):
+    """Return {symbol: (first, last stored bar date)} for stored symbols, optionally only `symbols`"""
+    query = select(StockPrice.symbol, func.min(StockPrice.date), func.max(StockPrice.date))
+    if symbols is not None:
+        query = query.where(StockPrice.symbol.in_(list(symbols)))
+    query = query.group_by(StockPrice.symbol)
+    with get_session() as session:
+        return {symbol: (pd.Timestamp(first), pd.Timestamp(last))
+                for symbol, first, last in session.execute(query)}
+
+class SQLitePriceStore:
+    """Price store backed by the row-per-bar stock_prices table"""
+
+    def load_prices(self, symbol, start=None, end=None):
+        return load_prices(symbol, start, end)
+
+    def upsert_prices(self, symbol, df):
+        return upsert_prices(symbol, df)
+
+    def replace_prices(self, symbol, df):
+        return replace_prices(symbol, df)
+
+    def bulk_upsert_prices(self, frames):
+        return bulk_upsert_prices(frames)
+
+    def price_ranges(self, symbols):
+        return price_ranges(symbols)
+
+_price_store = None
+
+def get_price_store():
+    """
+    Return the configured price store, created on first use.
+    PRICE_STORE selects 'sqlite' (default) or 'columnar'; the columnar
+    store keeps its files under PRICE_STORE_DIR (default ./price_data).
+    """
+    global _price_store
+    if _price_store is None:
+        backend = os.environ.get('PRICE_STORE', 'sqlite')
+        if backend == 'sqlite':
+            _price_store = SQLitePriceStore()
+        elif backend == 'columnar':
+            from columnar import ColumnarPriceStore
+            _price_store = ColumnarPriceStore(os.environ.get('PRICE_STORE_DIR', 'price_data'))
+        else:
+            raise ValueError(f"Unknown price store: {backend}")
+    return _price_store
+
+def load_info(symbol):
+    """Return stored company information for a symbol as a dict, or None"""
+    with get_session() as session:
+        row = session.execute(
+            select(StockInfo).where(StockInfo.symbol == symbol)
+        ).scalar_one_or_none()
+        if row is None:
+            return None
+        return {
+            'longName': row.company_name,
+            'sector': row.sector,
+            'industry': row.industry,
+            'marketCap': row.market_cap,
+            'last_updated': row.last_updated,
+        }
+
+def save_info(symbol, info):
+    """Insert or update company information from a yfinance `info` dict"""
+    values = {
+        'company_name': info.get('longName') or info.get('shortName'),
+        'sector': info.get('sector'),
+        'industry': info.get('industry'),
+        'market_cap': info.get('marketCap'),
+        'last_updated': datetime.utcnow(),
+    }
+    statement = sqlite_insert(StockInfo).values(symbol=symbol, **values)
+    statement = statement.on_conflict_do_update(index_elements=['symbol'], set_=values)
+    with get_session() as session, session.begin():
+        session.execute(statement)
+
+def save_indicator_state(symbol, last_date, state):
+    """Store the `IncrementalIndicators.to_state()` snapshot for a symbol"""
+    values = {
+        'last_date': last_date,
+        'state': json.dumps(state),
+        'updated_at': datetime.utcnow(),
+    }
+    statement = sqlite_insert(IndicatorState).values(symbol=symbol, **values)
+    statement = statement.on_conflict_do_update(index_elements=['symbol'], set_=values)
+    with get_session() as session, session.begin():
+        session.execute(statement)
+
+def load_indicator_state(symbol):
+    """Return (last_date, state) for a symbol, or (None, None) if nothing is stored"""
+    with get_session() as session:
+        row = session.get(IndicatorState, symbol)
+        if row is None:
+            return None, None
+        return row.last_date, json.loads(row.state)
+
+# indicator_state key of the state saved with materialized rows, kept apart
+# from the snapshots written by utils.get_live_indicators
+DERIVED_STATE_SUFFIX = '@derived'
+
+# Derived table columns and the frame columns they hold
+INDICATOR_FIELDS = {'ma20': 'MA20', 'rsi': 'RSI', 'supertrend': 'supertrend'}
+PIVOT_FIELDS = {'pivot': 'Pivot Point', 'r1': 'Resistance 1', 'r2': 'Resistance 2', 'r3': 'Resistance 3',
+                'r4': 'Resistance 4', 's1': 'Support 1', 's2': 'Support 2', 's3': 'Support 3', 's4': 'Support 4'}
+
+def _derived_records(frame, fields, **keys):
+    # Positional columns, so level names with spaces need no renaming
+    values = [frame[column].tolist() for column in fields.values()]
+    return [dict(keys, date=date, **dict(zip(fields, row)))
+            for date, row in zip(frame.index.to_pydatetime(), zip(*values))]
+
+def _upsert(model, fields, index_elements):
+    statement = sqlite_insert(model)
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={name: statement.excluded[name] for name in fields},
+    )
+
+_indicator_upsert = _upsert(DailyIndicator, INDICATOR_FIELDS, ['symbol', 'date'])
+_pivot_upsert = _upsert(PivotLevel, PIVOT_FIELDS, ['symbol', 'method', 'date'])
+
+def save_derived(results):
+    """
+    Store materialized indicators, pivot levels and indicator state for many
+    symbols in one transaction, so rows and state never disagree.
+    `results` maps symbol -> (indicators frame, {method: levels frame}, last_date, state).
+    Returns the number of indicator rows written.
+    """
+    indicator_rows = []
+    pivot_rows = []
+    states = []
+    for symbol, (frame, pivots, last_date, state) in results.items():
+        indicator_rows.extend(_derived_records(frame, INDICATOR_FIELDS, symbol=symbol))
+        for method, levels in pivots.items():
+            pivot_rows.extend(_derived_records(levels, PIVOT_FIELDS, symbol=symbol, method=method))
+        states.append({'symbol': symbol + DERIVED_STATE_SUFFIX, 'last_date': last_date, 'state': json.dumps(state),
+                       'updated_at': datetime.utcnow()})
+    if not states:
+        return 0
+    state_upsert = _upsert(IndicatorState, ('last_date', 'state', 'updated_at'), ['symbol'])
+    with engine.begin() as conn:
+        if indicator_rows:
+            conn.execute(_indicator_upsert, indicator_rows)
+        if pivot_rows:
+            conn.execute(_pivot_upsert, pivot_rows)
+        conn.execute(state_upsert, states)
+    return len(indicator_rows)
+
+def derived_ranges():
+    """Return {symbol: (first, last materialized bar date)} for every materialized symbol"""
+    query = select(DailyIndicator.symbol, func.min(DailyIndicator.date), func.max(DailyIndicator.date)
+                   ).group_by(DailyIndicator.symbol)
+    with get_session() as session:
+        return {symbol: (pd.Timestamp(first), pd.Timestamp(last)) for symbol, first, last in session.execute(query)}
+
+def load_derived_indicators(symbol, start=None, end=None):
+    """
+    Materialized MA20, RSI and supertrend for a symbol between `start` and `end`,
+    oldest first, as a DataFrame indexed by date (empty if nothing is stored).
+    """
+    query = select(DailyIndicator.date.label('Date'),
+                   *(getattr(DailyIndicator, field).label(column) for field, column in INDICATOR_FIELDS.items())
+                   ).where(DailyIndicator.symbol == symbol)
+    if start is not None:
+        query = query.where(DailyIndicator.date >= pd.Timestamp(start).to_pydatetime())
+    if end is not None:
+        query = query.where(DailyIndicator.date <= pd.Timestamp(end).to_pydatetime())
+    query = query.order_by(DailyIndicator.date)
+
+    with get_session() as session:
+        rows = session.execute(query).all()
+    df = pd.DataFrame(rows, columns=['Date'] + list(INDICATOR_FIELDS.values()))
+    df['Date'] = pd.to_datetime(df['Date'])
+    # SQLite stores NaN as NULL
+    return df.set_index('Date').astype(float)
+
+def load_pivot_levels(symbol, method, date):
+    """Materialized levels derived from the bar on `date`, keyed like `calculate_pivot_points`, or None"""
+    with get_session() as session:
+        row = session.get(PivotLevel, (symbol, method, pd.Timestamp(date).to_pydatetime()))
+        if row is None:
+            return None
+        return {column: getattr(row, field) for field, column in PIVOT_FIELDS.items()}
+
+def load_derived_state(symbol):
+    """Return (last_date, state) saved with a symbol's materialized rows, or (None, None)"""
+    return load_indicator_state(symbol + DERIVED_STATE_SUFFIX)
@@ -0,0 +1,163 @@
+"""
+Process-wide cache for price frames and derived data, shared by every
+Streamlit session in the process.
+
+Entries are evicted least-recently-used once their estimated size exceeds
+a memory budget (DATA_CACHE_MB, default 256). Loads are single-flight:
+while one thread is computing a key, other threads asking for the same key
+wait for that result instead of starting their own fetch. Failed loads are
+not cached; every waiter sees the same exception.
+
+Keys are tuples whose first element names the kind of data ('history',
+'indicators', ...); hit, miss and coalesced counts are kept per kind and
+also reported through `tracing`.
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+import numpy as np
+import pandas as pd
+from tracing import count
+
+DEFAULT_BUDGET_BYTES = int(float(os.environ.get('DATA_CACHE_MB', 256)) * 2**20)
+
+
+def estimate_size(value):
+    """Approximate bytes held by a cached value"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+class _Flight:
+    """One in-progress load that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SharedCache:
+    """Thread-safe LRU cache with a byte budget and single-flight loading"""
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET_BYTES, name='data'):
+        self.max_bytes = max_bytes
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (value, size, expires)
+        self._flights = {}
+        self._bytes = 0
+        self._stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0})
+
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        Return the cached value for `key`, calling `loader()` on a miss.
+        Entries older than `ttl` seconds count as misses.
+        """
+        kind = key[0] if isinstance(key, tuple) else self.name
+        count('cache_lookups_total', cache=kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[2] is None or entry[2] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self._stats[kind]['hits'] += 1
+                return entry[0]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats[kind]['misses'] += 1
+            else:
+                self._stats[kind]['coalesced'] += 1
+
+        if not leader:
+            count('cache_coalesced_total', cache=kind)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        count('cache_misses_total', cache=kind)
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            self._store(key, kind, flight.value, ttl)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return flight.value
+
+    def contains(self, key):
+        """True when `key` holds an unexpired entry; not counted as a lookup"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[2] is None or entry[2] > time.monotonic())
+
+    def _store(self, key, kind, value, ttl):
+        size = estimate_size(value)
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                # Larger than the whole budget; hand it back without keeping it
+                return
+            self._entries[key] = (value, size, expires)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted_key, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                evicted_kind = evicted_key[0] if isinstance(evicted_key, tuple) else self.name
+                self._stats[evicted_kind]['evictions'] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Counts per kind plus the current size, for the debug panel"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'in_flight': len(self._flights),
+                'kinds': {kind: dict(counts) for kind, counts in self._stats.items()},
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The process-wide cache, created on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SharedCache()
+    return _cache
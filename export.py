@@ -0,0 +1,89 @@
+"""
+On-demand export of price/indicator frames.
+
+Nothing here runs until a download is requested. CSV is generated in row
+chunks, so the gzip and zip writers compress as they go instead of
+holding a whole CSV string next to the compressed copy. Parquet needs
+pyarrow (or fastparquet) and is only offered when one is installed.
+"""
+import gzip
+import importlib.util
+import io
+import zipfile
+
+# Rows per CSV chunk
+CHUNK_ROWS = 50_000
+
+# format -> (file extension, mime type)
+FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'csv.gz': ('csv.gz', 'application/gzip'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def available_formats():
+    """Formats that can be written in this environment"""
+    formats = ['csv', 'csv.gz']
+    if importlib.util.find_spec('pyarrow') or importlib.util.find_spec('fastparquet'):
+        formats.append('parquet')
+    return formats
+
+
+def iter_csv(df, chunk_rows=CHUNK_ROWS):
+    """Yield the CSV text of `df` in chunks of `chunk_rows` rows, header first"""
+    yield df.iloc[:0].to_csv()
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(header=False)
+
+
+def _write_csv(df, raw):
+    """Stream the CSV of `df` into the binary file object `raw`"""
+    for chunk in iter_csv(df):
+        raw.write(chunk.encode('utf-8'))
+
+
+def export_frame(df, fmt='csv'):
+    """Serialise one frame to bytes in `fmt` (a key of FORMATS)"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    buffer = io.BytesIO()
+    if fmt == 'csv':
+        _write_csv(df, buffer)
+    elif fmt == 'csv.gz':
+        with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as raw:
+            _write_csv(df, raw)
+    else:
+        df.to_parquet(buffer)
+    return buffer.getvalue()
+
+
+def export_bundle(frames, fmt='csv'):
+    """
+    Zip archive with one file per symbol, e.g. RELIANCE.csv.
+    `frames` is a dict of symbol -> DataFrame; members are written one at a time.
+    """
+    extension = FORMATS[fmt][0]
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for symbol, df in frames.items():
+            name = f"{symbol.replace('.NS', '')}.{extension}"
+            if fmt == 'csv':
+                # ZipInfo defaults to stored; deflate plain CSV as it streams in
+                info = zipfile.ZipInfo(name)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, 'w') as raw:
+                    _write_csv(df, raw)
+            else:
+                # Already compressed, store as-is
+                archive.writestr(name, export_frame(df, fmt), compress_type=zipfile.ZIP_STORED)
+    return buffer.getvalue()
+
+
+def file_name(stem, fmt):
+    """Download file name for `stem` in `fmt`"""
+    return f"{stem}.{FORMATS[fmt][0]}"
+
+
+def mime_type(fmt):
+    return FORMATS[fmt][1]
@@ -0,0 +1,340 @@
+"""
+Asynchronous client for Yahoo's v8 chart API, used by `providers.YahooProvider`.
+
+All requests in the process share one fetcher, so sessions and batch jobs
+are throttled together:
+    - a token bucket caps the request rate (FETCH_RATE per second, bursts of FETCH_BURST)
+    - at most FETCH_CONCURRENCY requests are in flight
+    - 429, 5xx and network errors are retried FETCH_RETRIES times with
+      jittered exponential backoff, honouring Retry-After
+    - HTTP/1.1 keep-alive connections are pooled per host
+
+Synchronous callers go through `run` (or `fetch_histories`), which executes
+coroutines of the shared fetcher on a background event loop. Code with its
+own event loop creates a `ChartFetcher` and can await `histories` for
+hundreds of symbols at once. YAHOO_CHART_URL points the fetcher at another
+server, such as a local stub.
+"""
+import asyncio
+import gzip
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit, quote
+import numpy as np
+import pandas as pd
+from providers import PERIOD_DAYS, PRICE_COLUMNS
+from tracing import span, count
+
+CHART_URL = os.environ.get('YAHOO_CHART_URL', 'https://query2.finance.yahoo.com/v8/finance/chart/')
+# The burst covers the bundled 50-symbol universe, so a cold watchlist, screener
+# or backtest goes out at once (FETCH_CONCURRENCY at a time); only longer runs
+# such as a backfill of the full listing are held to FETCH_RATE
+FETCH_RATE = float(os.environ.get('FETCH_RATE', 5))
+FETCH_BURST = int(os.environ.get('FETCH_BURST', 60))
+FETCH_CONCURRENCY = int(os.environ.get('FETCH_CONCURRENCY', 8))
+FETCH_RETRIES = int(os.environ.get('FETCH_RETRIES', 3))
+# Seconds per attempt; a retry starts a fresh attempt rather than waiting out the same one
+FETCH_TIMEOUT = float(os.environ.get('FETCH_TIMEOUT', 10))
+
+# Statuses worth retrying; anything else is reported straight away
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# Yahoo serves at most this many days of 1m bars per request
+MINUTE_WINDOW_DAYS = 7
+
+HEADERS = {
+    # Yahoo rejects requests without a browser-like user agent
+    'User-Agent': 'Mozilla/5.0',
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip',
+    'Connection': 'keep-alive',
+}
+
+class FetchError(Exception):
+    """A request that failed for good; `status` is the HTTP status, or None for network errors"""
+
+    def __init__(self, message, status=None, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average and up to `burst` at once"""
+
+    def __init__(self, rate=FETCH_RATE, burst=FETCH_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out first come, first served
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port), used from worker threads"""
+
+    def __init__(self, max_idle=FETCH_CONCURRENCY, timeout=FETCH_TIMEOUT):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _checkout(self, origin):
+        with self._lock:
+            idle = self._idle.get(origin)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = origin
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        count('fetch_connections_total', host=host)
+        return cls(host, port, timeout=self.timeout), False
+
+    def _checkin(self, origin, conn):
+        with self._lock:
+            idle = self._idle.setdefault(origin, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, url):
+        """GET `url`. Returns (status, headers, body); raises OSError or HTTPException on network failure"""
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.hostname, parts.port)
+        target = parts.path + (f"?{parts.query}" if parts.query else '')
+        while True:
+            conn, reused = self._checkout(origin)
+            try:
+                conn.request('GET', target, headers=HEADERS)
+                response = conn.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                if reused:
+                    # The server closed an idle connection; try again on a new one
+                    continue
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(origin, conn)
+            if response.getheader('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            return response.status, response.headers, body
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+def _retry_after(headers):
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _chart_error(symbol, status, body):
+    """Yahoo's own error description when the body carries one"""
+    try:
+        error = json.loads(body)['chart']['error']
+        return f"{symbol}: {error['description']}"
+    except (ValueError, KeyError, TypeError):
+        return f"{symbol}: HTTP {status}"
+
+
+def parse_chart(payload, interval='1d'):
+    """
+    OHLCV frame from a chart API response, indexed by naive exchange-local
+    time like the other providers. Daily bars are split and dividend adjusted.
+    """
+    result = payload['chart']['result'][0]
+    timestamps = result.get('timestamp')
+    if not timestamps:
+        return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+    quote_ = result['indicators']['quote'][0]
+    df = pd.DataFrame({
+        'Open': np.array(quote_['open'], dtype=float),
+        'High': np.array(quote_['high'], dtype=float),
+        'Low': np.array(quote_['low'], dtype=float),
+        'Close': np.array(quote_['close'], dtype=float),
+        'Volume': np.array(quote_['volume'], dtype=float),
+    }, index=pd.to_datetime(timestamps, unit='s', utc=True))
+    tz = result.get('meta', {}).get('exchangeTimezoneName', 'Asia/Kolkata')
+    df.index = df.index.tz_convert(tz).tz_localize(None)
+    adjclose = result['indicators'].get('adjclose')
+    if interval == '1d':
+        df.index = df.index.normalize()
+        if adjclose:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = np.array(adjclose[0]['adjclose'], dtype=float) / df['Close'].to_numpy()
+            df[['Open', 'High', 'Low', 'Close']] *= np.where(np.isfinite(ratio), ratio, 1.0)[:, None]
+    # Yahoo pads halted bars with nulls and repeats the live bar
+    df = df[df['Close'].notna()]
+    df = df[~df.index.duplicated(keep='last')]
+    df['Volume'] = df['Volume'].fillna(0).astype(np.int64)
+    df.index.name = 'Date'
+    return df
+
+
+class ChartFetcher:
+    """Rate-limited, retrying chart API client; see the module docstring"""
+
+    def __init__(self, base_url=CHART_URL, rate=FETCH_RATE, burst=FETCH_BURST,
+                 concurrency=FETCH_CONCURRENCY, retries=FETCH_RETRIES, timeout=FETCH_TIMEOUT):
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.retries = retries
+        self.bucket = TokenBucket(rate, burst)
+        self.pool = ConnectionPool(concurrency, timeout)
+        self._slots = asyncio.Semaphore(concurrency)
+        # Blocking socket I/O runs here, sized so every slot has a thread
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='fetch')
+
+    def url(self, symbol, period=None, start=None, end=None, interval='1d'):
+        params = {'interval': interval, 'includePrePost': 'false', 'events': 'div,split'}
+        if start is not None:
+            params['period1'] = int(pd.Timestamp(start).timestamp())
+            params['period2'] = int(pd.Timestamp(end or datetime.now() + timedelta(days=1)).timestamp())
+        else:
+            params['range'] = period or '1y'
+        return f"{self.base_url}{quote(symbol)}?{urlencode(params)}"
+
+    async def _attempt(self, symbol, url):
+        await self.bucket.acquire()
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            try:
+                status, headers, body = await loop.run_in_executor(self._executor, self.pool.request, url)
+            except (OSError, http.client.HTTPException) as e:
+                raise FetchError(f"{symbol}: {e.__class__.__name__}: {e}", retryable=True) from e
+        if status == 200:
+            return json.loads(body)
+        raise FetchError(_chart_error(symbol, status, body), status=status,
+                         retryable=status in RETRY_STATUSES, retry_after=_retry_after(headers))
+
+    async def get_json(self, symbol, url):
+        """Fetch and decode `url`, retrying transient failures"""
+        for attempt in range(self.retries + 1):
+            try:
+                with span('fetch.request'):
+                    return await self._attempt(symbol, url)
+            except FetchError as e:
+                count('fetch_errors_total', status=str(e.status or 'network'))
+                if not e.retryable or attempt == self.retries:
+                    raise
+                # Full jitter keeps throttled clients from retrying in lockstep
+                delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+                if e.retry_after is not None:
+                    delay = max(delay, e.retry_after)
+                count('fetch_retries_total')
+                await asyncio.sleep(delay)
+
+    async def history(self, symbol, period=None, start=None, interval='1d'):
+        """Bars for `symbol`, like `MarketDataProvider.history`"""
+        if interval == '1m' and (start is not None or PERIOD_DAYS.get(period, 0) > MINUTE_WINDOW_DAYS):
+            # Longer 1m ranges have to be fetched a week at a time; the windows go out together
+            end = pd.Timestamp(datetime.now()).normalize() + timedelta(days=1)
+            first = pd.Timestamp(start) if start is not None else end - timedelta(days=PERIOD_DAYS[period])
+            windows = []
+            while first < end:
+                windows.append((first, min(first + timedelta(days=MINUTE_WINDOW_DAYS), end)))
+                first = windows[-1][1]
+            payloads = await asyncio.gather(*(
+                self.get_json(symbol, self.url(symbol, start=a, end=b, interval=interval)) for a, b in windows))
+            frames = [parse_chart(payload, interval) for payload in payloads]
+            frames = [frame for frame in frames if not frame.empty]
+            if not frames:
+                return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+            hist = pd.concat(frames)
+            return hist[~hist.index.duplicated(keep='last')]
+        payload = await self.get_json(symbol, self.url(symbol, period, start, interval=interval))
+        return parse_chart(payload, interval)
+
+    async def histories(self, symbols, period=None, start=None, interval='1d'):
+        """
+        Bars for many symbols at once.
+        Returns (frames, errors): dicts of symbol -> DataFrame and symbol -> error message.
+        """
+        results = await asyncio.gather(*(self.history(symbol, period, start, interval) for symbol in symbols),
+                                       return_exceptions=True)
+        frames = {}
+        errors = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                errors[symbol] = str(result)
+            elif result.empty:
+                errors[symbol] = "No data found"
+            else:
+                frames[symbol] = result
+        return frames, errors
+
+    def close(self):
+        self.pool.close()
+        self._executor.shutdown(wait=False)
+
+
+_fetcher = None
+_loop = None
+_lock = threading.Lock()
+
+
+def _event_loop():
+    """The background loop that runs fetches for synchronous callers"""
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='fetch-loop', daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def get_fetcher():
+    """The process-wide fetcher, created on first use"""
+    global _fetcher
+    if _fetcher is None:
+        with _lock:
+            if _fetcher is None:
+                _fetcher = ChartFetcher()
+    return _fetcher
+
+
+def set_fetcher(fetcher):
+    """Use `fetcher` for all subsequent requests"""
+    global _fetcher
+    _fetcher = fetcher
+
+
+def run(coro):
+    """Run `coro` on the background loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop()).result()
+
+
+def fetch_histories(symbols, period=None, start=None, interval='1d'):
+    """Synchronous `ChartFetcher.histories` on the shared fetcher"""
+    return run(get_fetcher().histories(list(symbols), period, start, interval))
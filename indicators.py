@@ -0,0 +1,537 @@
+"""
+Array-based technical indicator kernels.
+
+Every function here works on plain NumPy buffers and returns NumPy arrays,
+so callers can run them on raw price columns without any pandas indexing.
+IncrementalIndicators is the streaming counterpart for bar-by-bar updates.
+"""
+import math
+from collections import deque
+import numpy as np
+
+
+def rolling_mean(values, window):
+    """
+    Trailing mean over `window` values.
+    Matches pandas `rolling(window).mean()`: NaN until the window is full
+    and NaN for any window that contains a NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    if window <= 0 or len(values) < window:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+    out[window - 1:] = windows.sum(axis=-1) / window
+    return out
+
+
+def price_delta(close):
+    """Bar-to-bar change in close, NaN for the first bar"""
+    close = np.asarray(close, dtype=float)
+    delta = np.empty(close.shape)
+    delta[:1] = np.nan
+    delta[1:] = close[1:] - close[:-1]
+    return delta
+
+
+def rsi_from_delta(delta, window=14):
+    """Relative Strength Index using simple rolling averages of gains and losses"""
+    # Comparisons against NaN are False, so the first bar counts as a zero move
+    gain = rolling_mean(np.where(delta > 0, delta, 0.0), window)
+    loss = rolling_mean(np.where(delta < 0, -delta, 0.0), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = gain / loss
+        return 100 - (100 / (1 + rs))
+
+
+def rsi(close, window=14):
+    """Relative Strength Index of a close series"""
+    return rsi_from_delta(price_delta(close), window)
+
+
+def true_range_components(high, low, close):
+    """Return the three true range candidates (H-L, |H-Cprev|, |L-Cprev|)"""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    prev_close = np.empty(close.shape)
+    prev_close[:1] = np.nan
+    prev_close[1:] = close[:-1]
+    return np.abs(high - low), np.abs(high - prev_close), np.abs(low - prev_close)
+
+
+def true_range(high, low, close):
+    """True range, skipping NaN candidates like pandas `max(axis=1)`"""
+    tr0, tr1, tr2 = true_range_components(high, low, close)
+    return np.fmax(np.fmax(tr0, tr1), tr2)
+
+
+# Level names shared by every pivot method, in display order
+PIVOT_LEVELS = ['Pivot Point', 'Resistance 1', 'Resistance 2', 'Resistance 3', 'Resistance 4',
+                'Support 1', 'Support 2', 'Support 3', 'Support 4']
+
+PIVOT_METHODS = ['classic', 'fibonacci', 'camarilla']
+
+
+def pivot_levels(high, low, close, method='classic'):
+    """
+    Pivot point and four support/resistance levels from each bar's high, low and close.
+    Works element-wise on scalars, 1-D series or (bars x symbols) arrays.
+    Returns a dict keyed by PIVOT_LEVELS.
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    pivot = (high + low + close) / 3
+    span = high - low
+
+    if method == 'classic':
+        r1 = (2 * pivot) - low
+        r2 = pivot + span
+        r3 = high + 2 * (pivot - low)
+        r4 = r3 + span
+        s1 = (2 * pivot) - high
+        s2 = pivot - span
+        s3 = low - 2 * (high - pivot)
+        s4 = s3 - span
+    elif method == 'fibonacci':
+        r1, r2, r3, r4 = (pivot + ratio * span for ratio in (0.382, 0.618, 1.0, 1.618))
+        s1, s2, s3, s4 = (pivot - ratio * span for ratio in (0.382, 0.618, 1.0, 1.618))
+    elif method == 'camarilla':
+        r1, r2, r3, r4 = (close + span * 1.1 / d for d in (12, 6, 4, 2))
+        s1, s2, s3, s4 = (close - span * 1.1 / d for d in (12, 6, 4, 2))
+    else:
+        raise ValueError(f"Unknown pivot method: {method}")
+
+    return dict(zip(PIVOT_LEVELS, (pivot, r1, r2, r3, r4, s1, s2, s3, s4)))
+
+
+def final_bands(close, basic_ub, basic_lb, start):
+    """
+    Run the Supertrend band recursion in a single pass.
+    Bars before `start` keep a band value of 0.0. 2-D inputs are treated
+    as (bars x symbols) and advance all columns together.
+    """
+    if np.ndim(close) == 2:
+        return _final_bands_2d(close, basic_ub, basic_lb, start)
+    n = len(close)
+    # Plain Python floats are much cheaper to index than NumPy scalars
+    c = np.asarray(close, dtype=float).tolist()
+    bu = np.asarray(basic_ub, dtype=float).tolist()
+    bl = np.asarray(basic_lb, dtype=float).tolist()
+    fu = [0.0] * n
+    fl = [0.0] * n
+    for i in range(max(start, 1), n):
+        prev_ub = fu[i - 1]
+        prev_lb = fl[i - 1]
+        prev_close = c[i - 1]
+        fu[i] = bu[i] if bu[i] < prev_ub or prev_close > prev_ub else prev_ub
+        fl[i] = bl[i] if bl[i] > prev_lb or prev_close < prev_lb else prev_lb
+    return np.array(fu, dtype=float), np.array(fl, dtype=float)
+
+
+def _final_bands_2d(close, basic_ub, basic_lb, start):
+    """Band recursion over time, vectorised across columns"""
+    close = np.asarray(close, dtype=float)
+    bu = np.asarray(basic_ub, dtype=float)
+    bl = np.asarray(basic_lb, dtype=float)
+    fu = np.zeros(bu.shape)
+    fl = np.zeros(bl.shape)
+    for i in range(max(start, 1), len(close)):
+        prev_ub = fu[i - 1]
+        prev_lb = fl[i - 1]
+        prev_close = close[i - 1]
+        fu[i] = np.where((bu[i] < prev_ub) | (prev_close > prev_ub), bu[i], prev_ub)
+        fl[i] = np.where((bl[i] > prev_lb) | (prev_close < prev_lb), bl[i], prev_lb)
+    return fu, fl
+
+
+def _first_bars(pipeline, high, low, close):
+    """
+    Row of each column's first bar for (bars x symbols) input, 0 for 1-D input.
+    Rows before it belong to dates the symbol was not listed on yet, so warm-up
+    periods count from it as they would on the symbol's own history.
+    """
+    if np.ndim(close) != 2:
+        return 0
+    traded = ~(np.isnan(high) & np.isnan(low) & np.isnan(close))
+    return np.where(traded.any(axis=0), traded.argmax(axis=0), len(close))
+
+
+def _before(close, starts):
+    """Mask of the rows before `starts` (a scalar or one row per column)"""
+    rows = np.arange(len(close))
+    return rows < starts if np.ndim(starts) == 0 else rows[:, None] < starts
+
+
+def _rsi_step(pipeline, delta, first):
+    values = rsi_from_delta(delta, pipeline.rsi_window)
+    if np.ndim(first) != 0:
+        # Unlisted rows have no move at all, not a zero one
+        values[_before(delta, first + pipeline.rsi_window - 1)] = np.nan
+    return values
+
+
+def _final_bands_step(pipeline, close, basic_ub, basic_lb, first):
+    starts = first + pipeline.supertrend_period
+    if np.ndim(starts) == 0:
+        return final_bands(close, basic_ub, basic_lb, starts)
+    # Zero basic bands keep a column's final bands at 0.0 until its own start,
+    # exactly as if its recursion began there (see IndicatorGrid.supertrend)
+    warming = _before(close, starts)
+    basic_ub = np.where(warming, 0.0, basic_ub)
+    basic_lb = np.where(warming, 0.0, basic_lb)
+    return _final_bands_2d(close, basic_ub, basic_lb, int(starts.min(initial=len(close))))
+
+
+def _supertrend_step(pipeline, close, final_ub, final_lb, first):
+    trend = np.where(close <= final_ub, final_ub, final_lb)
+    trend[_before(close, first + pipeline.supertrend_period)] = 0.0
+    return trend
+
+
+# name: (dependencies, step function)
+PIPELINE_STEPS = {
+    'MA20': (('close',), lambda p, close: rolling_mean(close, p.ma_window)),
+    'delta': (('close',), lambda p, close: price_delta(close)),
+    'first_bar': (('high', 'low', 'close'), _first_bars),
+    'RSI': (('delta', 'first_bar'), _rsi_step),
+    'tr_components': (('high', 'low', 'close'), lambda p, high, low, close: true_range_components(high, low, close)),
+    'tr0': (('tr_components',), lambda p, parts: parts[0]),
+    'tr1': (('tr_components',), lambda p, parts: parts[1]),
+    'tr2': (('tr_components',), lambda p, parts: parts[2]),
+    'tr': (('tr0', 'tr1', 'tr2'), lambda p, tr0, tr1, tr2: np.fmax(np.fmax(tr0, tr1), tr2)),
+    'atr': (('tr',), lambda p, tr: rolling_mean(tr, p.supertrend_period)),
+    'hl2': (('high', 'low'), lambda p, high, low: (high + low) / 2),
+    'basic_ub': (('hl2', 'atr'), lambda p, hl2, atr: hl2 + (p.supertrend_multiplier * atr)),
+    'basic_lb': (('hl2', 'atr'), lambda p, hl2, atr: hl2 - (p.supertrend_multiplier * atr)),
+    'final_bands': (('close', 'basic_ub', 'basic_lb', 'first_bar'), _final_bands_step),
+    'final_ub': (('final_bands',), lambda p, bands: bands[0]),
+    'final_lb': (('final_bands',), lambda p, bands: bands[1]),
+    'supertrend': (('close', 'final_ub', 'final_lb', 'first_bar'), _supertrend_step),
+}
+
+# Columns published on the indicator frame, in display order
+PUBLISHED_COLUMNS = ['MA20', 'RSI', 'tr0', 'tr1', 'tr2', 'tr', 'atr',
+                     'basic_ub', 'basic_lb', 'final_ub', 'final_lb', 'supertrend']
+
+# The subset worth keeping when the scratch series are not needed
+LEAN_COLUMNS = ['MA20', 'RSI', 'supertrend']
+
+
+class IndicatorPipeline:
+    """
+    Lazily evaluates indicator series from their declared dependencies.
+    Each series is computed at most once per pipeline instance.
+    """
+
+    def __init__(self, high, low, close, ma_window=20, rsi_window=14,
+                 supertrend_period=10, supertrend_multiplier=3):
+        self.ma_window = ma_window
+        self.rsi_window = rsi_window
+        self.supertrend_period = supertrend_period
+        self.supertrend_multiplier = supertrend_multiplier
+        self._series = {
+            'high': np.asarray(high, dtype=float),
+            'low': np.asarray(low, dtype=float),
+            'close': np.asarray(close, dtype=float),
+        }
+
+    def __getitem__(self, name):
+        if name not in self._series:
+            if name not in PIPELINE_STEPS:
+                raise KeyError(f"Unknown indicator: {name}")
+            deps, step = PIPELINE_STEPS[name]
+            self._series[name] = step(self, *[self[dep] for dep in deps])
+        return self._series[name]
+
+    def computed(self):
+        """Names of the series evaluated so far"""
+        return list(self._series)
+
+    def columns(self, names=None, dtype=None):
+        """Return a dict of name -> array for the requested series, optionally cast to `dtype`"""
+        names = names or PUBLISHED_COLUMNS
+        if dtype is None:
+            return {name: self[name] for name in names}
+        return {name: self[name].astype(dtype, copy=False) for name in names}
+
+
+def prefix_sums(values):
+    """
+    Running sum and running NaN count of `values`, each with a leading zero,
+    so the sum of values[i - w + 1:i + 1] is csum[i + 1] - csum[i + 1 - w].
+    """
+    values = np.asarray(values, dtype=float)
+    nans = np.isnan(values)
+    csum = np.zeros(len(values) + 1)
+    np.cumsum(np.where(nans, 0.0, values), out=csum[1:])
+    cnan = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(nans, out=cnan[1:])
+    return csum, cnan
+
+
+def rolling_means(sums, windows):
+    """
+    Trailing means for several windows from one `prefix_sums` result, as a
+    (windows x bars) array. Same NaN rules as `rolling_mean`; each window is
+    two vector subtractions whatever its length. Differences of a running
+    sum carry a rounding error relative to the sum's magnitude (~1e-10 of
+    the mean for a million bars of prices).
+    """
+    csum, cnan = sums
+    n = len(csum) - 1
+    out = np.full((len(windows), n), np.nan)
+    for row, window in enumerate(windows):
+        if window <= 0 or n < window:
+            continue
+        total = csum[window:] - csum[:-window]
+        has_nan = (cnan[window:] - cnan[:-window]) > 0
+        out[row, window - 1:] = np.where(has_nan, np.nan, total / window)
+    return out
+
+
+class IndicatorGrid:
+    """
+    Indicators for many parameter values of one symbol at once.
+    The true range, the price delta and the prefix sums of close, gains,
+    losses and TR are built once and shared by every window, so a grid of
+    P windows costs P cheap subtractions rather than P full pipelines.
+    Results are (params x bars) arrays, or (periods x multipliers x bars)
+    for the supertrend.
+    """
+
+    def __init__(self, high, low, close):
+        self.high = np.asarray(high, dtype=float)
+        self.low = np.asarray(low, dtype=float)
+        self.close = np.asarray(close, dtype=float)
+        self._sums = {}
+
+    def _prefix(self, name):
+        if name not in self._sums:
+            if name == 'close':
+                values = self.close
+            elif name == 'tr':
+                values = true_range(self.high, self.low, self.close)
+            else:
+                delta = price_delta(self.close)
+                values = np.where(delta > 0, delta, 0.0) if name == 'gain' else np.where(delta < 0, -delta, 0.0)
+            self._sums[name] = prefix_sums(values)
+        return self._sums[name]
+
+    def ma(self, windows):
+        """Moving averages of close, (windows x bars)"""
+        return rolling_means(self._prefix('close'), windows)
+
+    def rsi(self, windows):
+        """RSI for each window, (windows x bars)"""
+        gain = rolling_means(self._prefix('gain'), windows)
+        loss = rolling_means(self._prefix('loss'), windows)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return 100 - (100 / (1 + gain / loss))
+
+    def atr(self, periods):
+        """Average true range for each period, (periods x bars)"""
+        return rolling_means(self._prefix('tr'), periods)
+
+    def supertrend(self, periods, multipliers):
+        """
+        Supertrend line for every (period, multiplier) pair,
+        shaped (periods x multipliers x bars).
+        """
+        periods = list(periods)
+        multipliers = np.asarray(multipliers, dtype=float)
+        n = len(self.close)
+        atr = self.atr(periods)                                    # (P, n)
+        hl2 = (self.high + self.low) / 2
+        # Columns are the P x M combinations, period-major
+        offsets = atr[:, None, :] * multipliers[None, :, None]     # (P, M, n)
+        basic_ub = np.ascontiguousarray((hl2 + offsets).reshape(-1, n).T)
+        basic_lb = np.ascontiguousarray((hl2 - offsets).reshape(-1, n).T)
+        starts = np.repeat(periods, len(multipliers))
+        # Zero basic bands keep a column's final bands at 0.0 until its own start,
+        # exactly as if its recursion began there
+        warming = np.arange(n)[:, None] < starts
+        basic_ub[warming] = 0.0
+        basic_lb[warming] = 0.0
+        final_ub, final_lb = _final_bands_2d(self.close[:, None], basic_ub, basic_lb, min(periods))
+        trend = np.where(self.close[:, None] <= final_ub, final_ub, final_lb)
+        trend[warming] = 0.0
+        return trend.T.reshape(len(periods), len(multipliers), n)
+
+
+def indicator_grid(high, low, close, ma_windows=(), rsi_windows=(),
+                   supertrend_periods=(), supertrend_multipliers=()):
+    """
+    Compute every requested parameter combination in one call.
+    Returns a dict with 'MA' and 'RSI' as (windows x bars), 'atr' as
+    (periods x bars) and 'supertrend' as (periods x multipliers x bars),
+    skipping any family whose parameter list is empty.
+    """
+    grid = IndicatorGrid(high, low, close)
+    result = {}
+    if ma_windows:
+        result['MA'] = grid.ma(ma_windows)
+    if rsi_windows:
+        result['RSI'] = grid.rsi(rsi_windows)
+    if supertrend_periods:
+        result['atr'] = grid.atr(supertrend_periods)
+        if len(supertrend_multipliers):
+            result['supertrend'] = grid.supertrend(supertrend_periods, supertrend_multipliers)
+    return result
+
+
+class _RollingWindow:
+    """Fixed-size window with a running sum and a count of NaN values"""
+
+    def __init__(self, size, values=()):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.nans = 0
+        for value in values:
+            self.push(value)
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            old = self.values[0]
+            if math.isnan(old):
+                self.nans -= 1
+            else:
+                self.total -= old
+        self.values.append(value)
+        if math.isnan(value):
+            self.nans += 1
+        else:
+            self.total += value
+
+    def mean(self):
+        if len(self.values) < self.size or self.nans:
+            return math.nan
+        return self.total / self.size
+
+
+class IncrementalIndicators:
+    """
+    Streaming version of the indicator pipeline for one symbol.
+    `update(bar)` advances MA20, RSI, ATR, the final bands and supertrend
+    by one bar in constant time and gives the same values as a full
+    recompute. State round-trips through `to_state`/`from_state`.
+    """
+
+    def __init__(self, ma_window=20, rsi_window=14, supertrend_period=10, supertrend_multiplier=3):
+        self.ma_window = ma_window
+        self.rsi_window = rsi_window
+        self.supertrend_period = supertrend_period
+        self.supertrend_multiplier = supertrend_multiplier
+        self.bars = 0
+        self.prev_close = math.nan
+        self.final_ub = 0.0
+        self.final_lb = 0.0
+        self.closes = _RollingWindow(ma_window)
+        self.gains = _RollingWindow(rsi_window)
+        self.losses = _RollingWindow(rsi_window)
+        self.trs = _RollingWindow(supertrend_period)
+
+    @classmethod
+    def from_history(cls, high, low, close, **params):
+        """Seed the state from a full history using the vectorised pipeline"""
+        self = cls(**params)
+        close = np.asarray(close, dtype=float)
+        if len(close) == 0:
+            return self
+        pipeline = IndicatorPipeline(high, low, close, self.ma_window, self.rsi_window,
+                                     self.supertrend_period, self.supertrend_multiplier)
+        delta = pipeline['delta']
+        self.bars = len(close)
+        self.prev_close = float(close[-1])
+        self.final_ub = float(pipeline['final_ub'][-1])
+        self.final_lb = float(pipeline['final_lb'][-1])
+        self.closes = _RollingWindow(self.ma_window, close[-self.ma_window:].tolist())
+        self.gains = _RollingWindow(self.rsi_window, np.where(delta > 0, delta, 0.0)[-self.rsi_window:].tolist())
+        self.losses = _RollingWindow(self.rsi_window, np.where(delta < 0, -delta, 0.0)[-self.rsi_window:].tolist())
+        self.trs = _RollingWindow(self.supertrend_period, pipeline['tr'][-self.supertrend_period:].tolist())
+        return self
+
+    def update(self, bar):
+        """
+        Advance by one bar (any mapping with High, Low and Close).
+        Returns a dict with MA20, RSI, atr, final_ub, final_lb and supertrend.
+        """
+        high = float(bar['High'])
+        low = float(bar['Low'])
+        close = float(bar['Close'])
+        prev_close = self.prev_close
+
+        self.closes.push(close)
+        delta = close - prev_close
+        # A NaN delta counts as no move, like the batch RSI
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+
+        candidates = [c for c in (abs(high - low), abs(high - prev_close), abs(low - prev_close))
+                      if not math.isnan(c)]
+        self.trs.push(max(candidates) if candidates else math.nan)
+
+        ma = self.closes.mean()
+        gain = self.gains.mean()
+        loss = self.losses.mean()
+        if math.isnan(gain) or math.isnan(loss):
+            rsi_value = math.nan
+        elif loss == 0:
+            rsi_value = 100.0 if gain > 0 else math.nan
+        else:
+            rsi_value = 100 - (100 / (1 + gain / loss))
+        atr = self.trs.mean()
+
+        trend = 0.0
+        if self.bars >= self.supertrend_period:
+            hl2 = (high + low) / 2
+            basic_ub = hl2 + self.supertrend_multiplier * atr
+            basic_lb = hl2 - self.supertrend_multiplier * atr
+            if not (basic_ub < self.final_ub or prev_close > self.final_ub):
+                basic_ub = self.final_ub
+            if not (basic_lb > self.final_lb or prev_close < self.final_lb):
+                basic_lb = self.final_lb
+            self.final_ub = basic_ub
+            self.final_lb = basic_lb
+            trend = self.final_ub if close <= self.final_ub else self.final_lb
+
+        self.bars += 1
+        self.prev_close = close
+        return {
+            'MA20': ma,
+            'RSI': rsi_value,
+            'atr': atr,
+            'final_ub': self.final_ub,
+            'final_lb': self.final_lb,
+            'supertrend': trend,
+        }
+
+    def to_state(self):
+        """JSON-serialisable snapshot of the indicator state"""
+        return {
+            'params': [self.ma_window, self.rsi_window, self.supertrend_period, self.supertrend_multiplier],
+            'bars': self.bars,
+            'prev_close': self.prev_close,
+            'final_ub': self.final_ub,
+            'final_lb': self.final_lb,
+            'closes': list(self.closes.values),
+            'gains': list(self.gains.values),
+            'losses': list(self.losses.values),
+            'trs': list(self.trs.values),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild an instance from `to_state` output"""
+        self = cls(*state['params'])
+        self.bars = state['bars']
+        self.prev_close = state['prev_close']
+        self.final_ub = state['final_ub']
+        self.final_lb = state['final_lb']
+        self.closes = _RollingWindow(self.ma_window, state['closes'])
+        self.gains = _RollingWindow(self.rsi_window, state['gains'])
+        self.losses = _RollingWindow(self.rsi_window, state['losses'])
+        self.trs = _RollingWindow(self.supertrend_period, state['trs'])
+        return self
@@ -0,0 +1,175 @@
+"""
+Post-close materialization of daily indicators and pivot levels.
+
+    python materialize.py                      # whole NSE list
+    python materialize.py --backfill           # top up stored bars first (see backfill.py)
+    python materialize.py --full TCS INFY      # recompute selected symbols from scratch
+
+Meant to run once the session has closed, e.g. from cron on weekdays:
+
+    30 16 * * 1-5  cd /path/to/app && python materialize.py --backfill
+
+For each symbol's stored daily bars it writes MA20, RSI and supertrend to
+daily_indicators, and the levels every bar gives for the following session
+to pivot_levels (one row per pivot method). Runs are incremental: the
+IncrementalIndicators state is saved one bar before the last materialized
+one, so each run derives that bar again (it may have been a partial session
+or revised since) along with the new bars. A symbol whose state no longer
+matches the close of the bar it was taken at, e.g. after Yahoo re-adjusted
+its history, is computed in full with the vectorised pipeline, as is one
+whose stored bars now reach back before its first materialized row (a longer
+backfill). Symbols are derived on a process pool, like the screener, and
+each batch is written in one transaction. The dashboard reads these rows
+instead of recomputing them.
+
+Values are seeded from each symbol's whole stored history, while the
+screener and backtest compute over the requested window only. MA20 and RSI
+agree once their windows have filled, but supertrend bands depend on where
+the series starts, so Trend can differ between the dashboard and those views
+for a while after a window starts.
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import pandas as pd
+import indicators
+from database import init_db, get_price_store, derived_ranges, load_derived_state, save_derived
+from providers import get_provider, storage_key
+from screener import PARALLEL_MIN_SYMBOLS
+
+
+def _derive(bars, state=None):
+    """
+    Indicators and pivot levels for `bars`. Without `state` the bars are the
+    symbol's whole history; with it, the first bar is the one the state was
+    taken at and only the rest are derived.
+    Returns (indicators frame, {method: levels frame}, state, state date), the
+    state taken one bar before the last unless there is only one bar.
+    """
+    derived = bars if state is None else bars.iloc[1:]
+    high, low, close = (derived[column].to_numpy(dtype=float) for column in ('High', 'Low', 'Close'))
+    if state is None:
+        pipeline = indicators.IndicatorPipeline(high, low, close)
+        frame = pd.DataFrame(pipeline.columns(indicators.LEAN_COLUMNS), index=derived.index)
+        seed = slice(None, -1) if len(bars) > 1 else slice(None)
+        state = indicators.IncrementalIndicators.from_history(high[seed], low[seed], close[seed]).to_state()
+    else:
+        live = indicators.IncrementalIndicators.from_state(state)
+        rows = []
+        for bar in derived[['High', 'Low', 'Close']].to_dict('records'):
+            state = live.to_state()
+            rows.append(live.update(bar))
+        frame = pd.DataFrame(rows, index=derived.index)[indicators.LEAN_COLUMNS]
+    pivots = {method: pd.DataFrame(indicators.pivot_levels(high, low, close, method), index=derived.index)
+              for method in indicators.PIVOT_METHODS}
+    return frame, pivots, state, bars.index[max(len(bars) - 2, 0)]
+
+
+def _pending_bars(store, key, derived, stored, full=False):
+    """
+    (bars, state) still to materialize for `key`, given the (first, last) dates
+    of its materialized and stored bars. With a state the bars start at the one
+    it was taken at; they hold nothing else when there is no bar to derive.
+    Stored history that now starts before the materialized rows, e.g. after a
+    longer backfill, is derived again in full so every row has the same seed.
+    """
+    last_date, state = load_derived_state(key)
+    first_derived, last_derived = derived or (None, None)
+    extended = stored is not None and first_derived is not None and stored[0] < first_derived
+    if not (full or extended or state is None or last_derived is None):
+        bars = store.load_prices(key, start=last_date)
+        # A changed close on the state's bar means history was revised under it
+        if (len(bars) and bars.index[0] == pd.Timestamp(last_date) and last_derived in bars.index
+                and state['prev_close'] == float(bars['Close'].iloc[0])):
+            return bars, state
+    return store.load_prices(key), None
+
+
+def materialize(symbols, batch_size=50, workers=None, full=False, log=print):
+    """
+    Derive and store indicators and pivot levels for `symbols` from their stored bars.
+    Returns a dict with rows written, elapsed seconds, skipped (nothing to derive) and failed symbols.
+    """
+    init_db()
+    provider = get_provider()
+    store = get_price_store()
+    derived = derived_ranges()
+
+    rows = 0
+    skipped = []
+    failed = {}
+    started = time.perf_counter()
+    pool = None
+    if workers is not None or len(symbols) >= PARALLEL_MIN_SYMBOLS:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for i in range(0, len(symbols), batch_size):
+            pending = {}
+            batch = symbols[i:i + batch_size]
+            stored = store.price_ranges([storage_key(symbol, provider) for symbol in batch])
+            for symbol in batch:
+                key = storage_key(symbol, provider)
+                bars, state = _pending_bars(store, key, derived.get(key), stored.get(key), full)
+                if bars.empty or (state is not None and len(bars) == 1):
+                    skipped.append(symbol)
+                else:
+                    pending[symbol] = (key, bars, state)
+
+            # Derivations start on the pool straight away; results are collected in order
+            if pool is None:
+                calls = {symbol: partial(_derive, bars, state) for symbol, (_, bars, state) in pending.items()}
+            else:
+                calls = {symbol: pool.submit(_derive, bars, state).result
+                         for symbol, (_, bars, state) in pending.items()}
+
+            results = {}
+            for symbol, call in calls.items():
+                try:
+                    frame, pivots, state, state_date = call()
+                except Exception as e:
+                    failed[symbol] = str(e)
+                    continue
+                key = pending[symbol][0]
+                results[key] = (frame, pivots, state_date.to_pydatetime(), state)
+            written = save_derived(results)
+            rows += written
+            if pending:
+                log(f"[{min(i + batch_size, len(symbols))}/{len(symbols)}] {written} rows")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    return {'rows': rows, 'seconds': elapsed, 'skipped': skipped, 'failed': failed}
+
+
+def main():
+    from utils import cli_symbols
+    parser = argparse.ArgumentParser(description="Precompute daily indicators and pivot levels into SQLite")
+    parser.add_argument('symbols', nargs='*', help="Symbols without .NS (default: the NSE list)")
+    parser.add_argument('--backfill', action='store_true', help="Download new bars before materializing")
+    parser.add_argument('--period', default='5y', help="History to fetch for new symbols with --backfill")
+    parser.add_argument('--full', action='store_true', help="Recompute from the whole history, ignoring saved state")
+    parser.add_argument('--batch-size', type=int, default=50, help="Symbols per write transaction")
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f"Worker processes (default: a pool only from {PARALLEL_MIN_SYMBOLS} symbols)")
+    args = parser.parse_args()
+
+    symbols = cli_symbols(args.symbols)
+
+    if args.backfill:
+        from backfill import backfill
+        result = backfill(symbols, args.period)
+        print(f"Backfilled {result['rows']:,} rows in {result['seconds']:.1f}s")
+
+    result = materialize(symbols, args.batch_size, args.workers, args.full)
+    rate = result['rows'] / result['seconds'] if result['seconds'] else 0
+    print(f"Materialized {result['rows']:,} bars in {result['seconds']:.1f}s ({rate:,.0f} bars/sec), "
+          f"{len(result['skipped'])} with nothing to derive")
+    for symbol, error in result['failed'].items():
+        print(f"Failed {symbol}: {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+"""
+Market data providers used by `utils.get_stock_data`.
+
+The provider is chosen with the MARKET_DATA_PROVIDER environment variable:
+    yahoo      live data from Yahoo Finance (default), fetched by fetcher.py
+    synthetic  deterministic generated OHLCV, no network needed
+    record     Yahoo Finance, saving every response as a local fixture
+    replay     serve previously recorded fixtures only, fully offline
+"""
+import os
+import json
+from abc import ABC, abstractmethod
+import zlib
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Calendar days spanned by each yfinance period
+PERIOD_DAYS = {'1d': 1, '5d': 7, '1mo': 31, '3mo': 92, '6mo': 183, '1y': 366, '2y': 731, '5y': 1827}
+
+# Bar sizes providers can serve, in minutes ('1d' is one daily bar)
+INTERVAL_MINUTES = {'1m': 1, '5m': 5, '15m': 15, '1h': 60, '1d': 1440}
+
+# Relative change in a re-fetched completed close that means history was re-adjusted
+ADJUSTMENT_TOLERANCE = 1e-6
+
+# NSE cash session, exchange-local time
+SESSION_OPEN = '09:15'
+SESSION_MINUTES = 375
+
+
+class MarketDataProvider(ABC):
+    """
+    Base class for market data sources.
+    `history` returns an OHLCV frame indexed by naive exchange-local dates
+    (bar start times for intraday intervals), oldest first; `info` returns
+    a yfinance-style metadata dict.
+    """
+    name = None
+
+    @abstractmethod
+    def history(self, symbol, period=None, start=None, interval='1d'):
+        pass
+
+    @abstractmethod
+    def info(self, symbol):
+        pass
+
+    def histories(self, symbols, period=None, start=None, interval='1d'):
+        """
+        Bars for many symbols, like `fetcher.ChartFetcher.histories`.
+        Returns (frames, errors): dicts of symbol -> DataFrame and symbol -> error message.
+        Providers that can batch requests override this; the default asks one symbol at a time.
+        """
+        frames = {}
+        errors = {}
+        for symbol in symbols:
+            try:
+                hist = self.history(symbol, period=period, start=start, interval=interval)
+            except Exception as e:
+                errors[symbol] = str(e)
+                continue
+            if hist.empty:
+                errors[symbol] = "No data found"
+            else:
+                frames[symbol] = hist
+        return frames, errors
+
+
+class YahooProvider(MarketDataProvider):
+    """
+    Live data from Yahoo Finance. Bars come from the chart API through the
+    shared rate-limited fetcher (see fetcher.py); metadata from yfinance.
+    """
+    name = 'yahoo'
+
+    def history(self, symbol, period=None, start=None, interval='1d'):
+        from fetcher import get_fetcher, run
+        return run(get_fetcher().history(symbol, period=period, start=start, interval=interval))
+
+    def histories(self, symbols, period=None, start=None, interval='1d'):
+        from fetcher import fetch_histories
+        return fetch_histories(symbols, period, start, interval)
+
+    def info(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    Deterministic random-walk OHLCV on business days.
+    The walk starts at a fixed epoch and is seeded from the symbol, so a
+    given (symbol, date) always produces the same bar.
+    """
+    name = 'synthetic'
+    EPOCH = '2000-01-03'
+
+    def __init__(self, seed=0, end=None):
+        self.seed = seed
+        self.end = end
+
+    def bars(self, symbol, end=None):
+        """All generated bars for `symbol` from the epoch up to `end`"""
+        end = pd.Timestamp(end or self.end or datetime.now()).normalize()
+        dates = pd.date_range(self.EPOCH, end, freq='D', name='Date')
+        # Vectorised weekday filter; bdate_range builds business days in Python
+        dates = dates[dates.dayofweek < 5]
+        rng = np.random.default_rng([zlib.crc32(symbol.encode()), self.seed])
+        n = len(dates)
+        close = rng.uniform(50, 5000) * np.exp(np.cumsum(rng.normal(0.0003, 0.015, n)))
+        open_ = close * (1 + rng.normal(0, 0.005, n))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, n)))
+        volume = rng.integers(100_000, 5_000_000, n)
+        return pd.DataFrame({'Open': open_, 'High': high, 'Low': low,
+                             'Close': close, 'Volume': volume}, index=dates)
+
+    def intraday_bars(self, symbol, days):
+        """
+        One-minute bars over the NSE session for each date in `days`. Each
+        session is a random bridge between that day's open and close from
+        `bars`, seeded per (symbol, date), so any range gives the same bars.
+        """
+        daily = self.bars(symbol, end=days[-1]).reindex(days)
+        steps = np.arange(SESSION_MINUTES)
+        frames = []
+        for day, bar in daily.iterrows():
+            rng = np.random.default_rng([zlib.crc32(symbol.encode()), self.seed, day.toordinal()])
+            walk = np.cumsum(rng.normal(0, 0.0008, SESSION_MINUTES))
+            # Pin the walk to the day's open and close
+            drift = np.log(bar['Close'] / bar['Open']) - walk[-1]
+            close = bar['Open'] * np.exp(walk + drift * (steps + 1) / SESSION_MINUTES)
+            open_ = np.concatenate([[bar['Open']], close[:-1]])
+            spread = np.abs(rng.normal(0, 0.0004, (2, SESSION_MINUTES)))
+            frames.append(pd.DataFrame({
+                'Open': open_,
+                'High': np.maximum(open_, close) * (1 + spread[0]),
+                'Low': np.minimum(open_, close) * (1 - spread[1]),
+                'Close': close,
+                'Volume': rng.integers(100, 20_000, SESSION_MINUTES),
+            }, index=day + pd.Timedelta(SESSION_OPEN + ':00') + pd.to_timedelta(steps, unit='min')))
+        if not frames:
+            return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+        hist = pd.concat(frames)
+        hist.index.name = 'Date'
+        return hist
+
+    def history(self, symbol, period=None, start=None, interval='1d'):
+        if interval == '1d':
+            return _slice_history(self.bars(symbol), period, start, end=self.end)
+        end = pd.Timestamp(self.end or datetime.now()).normalize()
+        first = pd.Timestamp(start).normalize() if start is not None else end - timedelta(days=PERIOD_DAYS.get(period, 7))
+        days = self.bars(symbol, end=end).index
+        days = days[days >= first]
+        if not len(days):
+            return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+        hist = _slice_history(self.intraday_bars(symbol, days), period, start, end=end)
+        if interval != '1m':
+            hist = resample_bars(hist, interval)
+        return hist
+
+    def info(self, symbol):
+        return {
+            'longName': f"{symbol.replace('.NS', '')} (synthetic)",
+            'sector': 'Synthetic',
+            'industry': 'Synthetic',
+            'marketCap': None,
+        }
+
+
+class RecordReplayProvider(MarketDataProvider):
+    """
+    Records responses from another provider as local fixtures, or replays them.
+    Bars are kept in one Parquet file per symbol and metadata in JSON.
+    When replaying, periods are measured back from the last recorded bar so
+    the same fixtures give the same frames on any day.
+    """
+
+    def __init__(self, fixture_dir='fixtures', mode='replay', inner=None):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.fixture_dir = fixture_dir
+        self.mode = mode
+        self.inner = inner or YahooProvider()
+        self.name = mode
+
+    def _path(self, symbol, suffix):
+        return os.path.join(self.fixture_dir, f"{symbol}.{suffix}")
+
+    def _history_path(self, symbol, interval):
+        return self._path(symbol, 'parquet' if interval == '1d' else f"{interval}.parquet")
+
+    def history(self, symbol, period=None, start=None, interval='1d'):
+        path = self._history_path(symbol, interval)
+        if self.mode == 'replay':
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No recorded history for {symbol} in {self.fixture_dir}")
+            recorded = pd.read_parquet(path)
+            return _slice_history(recorded, period, start, end=recorded.index.max())
+
+        hist = self.inner.history(symbol, period=period, start=start, interval=interval)
+        self._record(path, hist)
+        return hist
+
+    def histories(self, symbols, period=None, start=None, interval='1d'):
+        if self.mode == 'replay':
+            return super().histories(symbols, period, start, interval)
+        # Recording keeps the inner provider's batching
+        frames, errors = self.inner.histories(symbols, period, start, interval)
+        for symbol, hist in frames.items():
+            self._record(self._history_path(symbol, interval), hist)
+        return frames, errors
+
+    def _record(self, path, hist):
+        """Merge `hist` into the fixture at `path`, newer bars winning"""
+        if hist.empty:
+            return
+        os.makedirs(self.fixture_dir, exist_ok=True)
+        if os.path.exists(path):
+            recorded = pd.read_parquet(path)
+            hist = pd.concat([recorded[~recorded.index.isin(hist.index)], hist]).sort_index()
+        hist.to_parquet(path)
+
+    def info(self, symbol):
+        path = self._path(symbol, 'info.json')
+        if self.mode == 'replay':
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No recorded info for {symbol} in {self.fixture_dir}")
+            with open(path) as f:
+                return json.load(f)
+
+        info = self.inner.info(symbol)
+        os.makedirs(self.fixture_dir, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(info, f, indent=2, default=str)
+        return info
+
+
+def _slice_history(hist, period=None, start=None, end=None):
+    """Cut a full history down to what a period or start date request would return"""
+    if start is not None:
+        return hist[hist.index >= pd.Timestamp(start)]
+    days = PERIOD_DAYS.get(period)
+    if days is None:
+        return hist
+    end = pd.Timestamp(end or datetime.now()).normalize()
+    return hist[hist.index >= end - timedelta(days=days)]
+
+
+def readjusted(stored, fetched, tolerance=ADJUSTMENT_TOLERANCE):
+    """
+    True when completed daily bars present in both frames disagree: Yahoo
+    scales all earlier bars after a split or dividend, so the stored ones are
+    stale. The last stored bar is left out, it may have been a partial session.
+    """
+    overlap = stored.index[:-1].intersection(fetched.index)
+    if not len(overlap):
+        return False
+    return not np.allclose(stored.loc[overlap, 'Close'].to_numpy(dtype=float),
+                           fetched.loc[overlap, 'Close'].to_numpy(dtype=float),
+                           rtol=tolerance, atol=0, equal_nan=True)
+
+
+def resample_bars(hist, interval):
+    """
+    Roll intraday OHLCV up to `interval` (a key of INTERVAL_MINUTES).
+    Buckets start at the session open, so hourly bars run 09:15-10:15 like NSE's.
+    """
+    minutes = INTERVAL_MINUTES[interval]
+    rule = '1D' if minutes == INTERVAL_MINUTES['1d'] else f"{minutes}min"
+    offset = None if minutes in (1, INTERVAL_MINUTES['1d']) else pd.Timedelta(SESSION_OPEN + ':00') % pd.Timedelta(minutes=minutes)
+    bars = hist[PRICE_COLUMNS].resample(rule, offset=offset).agg({
+        'Open': 'first',
+        'High': 'max',
+        'Low': 'min',
+        'Close': 'last',
+        'Volume': 'sum',
+    })
+    # Buckets outside the session come back empty
+    return bars.dropna(subset=['Close'])
+
+
+def storage_key(symbol, provider):
+    """Symbol under which a provider's data is stored, so synthetic or replayed
+    bars never mix with real Yahoo history in the database"""
+    if provider.name in ('yahoo', 'record'):
+        return symbol
+    return f"{provider.name}:{symbol}"
+
+
+_provider = None
+
+
+def get_provider():
+    """Return the configured provider, created on first use"""
+    global _provider
+    if _provider is None:
+        name = os.environ.get('MARKET_DATA_PROVIDER', 'yahoo')
+        fixture_dir = os.environ.get('MARKET_DATA_FIXTURES', 'fixtures')
+        if name == 'yahoo':
+            _provider = YahooProvider()
+        elif name == 'synthetic':
+            _provider = SyntheticProvider()
+        elif name in ('record', 'replay'):
+            _provider = RecordReplayProvider(fixture_dir, mode=name)
+        else:
+            raise ValueError(f"Unknown market data provider: {name}")
+    return _provider
+
+
+def set_provider(provider):
+    """Use `provider` for all subsequent requests"""
+    global _provider
+    _provider = provider
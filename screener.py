@@ -0,0 +1,173 @@
+"""
+Cross-sectional screener.
+
+OHLCV for many symbols is stacked into (date x symbol) arrays and the
+indicator pipeline runs over all columns at once. Large universes are
+split into column chunks that run on a process pool.
+"""
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import indicators
+
+SCREEN_COLUMNS = ['MA20', 'RSI', 'atr', 'supertrend']
+
+# Symbols per process-pool task, and the universe size worth a pool at all
+CHUNK_SIZE = 250
+PARALLEL_MIN_SYMBOLS = 500
+
+
+def build_panel(frames):
+    """
+    Align per-symbol OHLCV frames on a shared date index.
+    Returns a dict of field -> DataFrame (dates x symbols).
+    """
+    symbols = list(frames)
+    panel = {}
+    for field in ('Open', 'High', 'Low', 'Close', 'Volume'):
+        panel[field] = pd.concat([frames[s][field] for s in symbols], axis=1, keys=symbols).sort_index()
+    return panel
+
+
+def _compute_chunk(high, low, close):
+    pipeline = indicators.IndicatorPipeline(high, low, close)
+    return pipeline.columns(SCREEN_COLUMNS)
+
+
+def compute_panel(panel, max_workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Compute MA20, RSI, ATR and supertrend for every symbol in the panel.
+    Returns a dict of name -> DataFrame shaped like the panel.
+    Symbols with gaps against the shared calendar see NaN bars where the
+    per-symbol calculation would have skipped the date.
+    """
+    high = panel['High'].to_numpy(dtype=float)
+    low = panel['Low'].to_numpy(dtype=float)
+    close = panel['Close'].to_numpy(dtype=float)
+    n_symbols = close.shape[1]
+
+    if n_symbols < PARALLEL_MIN_SYMBOLS and max_workers is None:
+        results = [_compute_chunk(high, low, close)]
+    else:
+        bounds = range(0, n_symbols, chunk_size)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(
+                _compute_chunk,
+                [high[:, i:i + chunk_size] for i in bounds],
+                [low[:, i:i + chunk_size] for i in bounds],
+                [close[:, i:i + chunk_size] for i in bounds],
+            ))
+
+    index = panel['Close'].index
+    columns = panel['Close'].columns
+    return {
+        name: pd.DataFrame(np.hstack([r[name] for r in results]), index=index, columns=columns)
+        for name in SCREEN_COLUMNS
+    }
+
+
+def panel_pivots(panel, method='classic'):
+    """
+    Daily pivot levels in force on every bar, derived from the previous bar of
+    each symbol (skipping dates the symbol has no bar on). Returns a dict of
+    level name -> DataFrame shaped like the panel.
+    """
+    traded = panel['Close'].notna()
+    prev = {field: panel[field].where(traded).ffill().shift(1).to_numpy(dtype=float)
+            for field in ('High', 'Low', 'Close')}
+    levels = indicators.pivot_levels(prev['High'], prev['Low'], prev['Close'], method)
+    index = panel['Close'].index
+    columns = panel['Close'].columns
+    return {name: pd.DataFrame(values, index=index, columns=columns) for name, values in levels.items()}
+
+
+def _last_bars(close, count=3):
+    """
+    Row positions of each symbol's last `count` bars with a close, latest first,
+    as a (count x symbols) array; -1 where a symbol has fewer bars.
+    """
+    valid = ~np.isnan(close)
+    rows = np.arange(len(close))[:, None]
+    positions = []
+    before = np.full(close.shape[1], len(close))
+    for _ in range(count):
+        before = np.where(valid & (rows < before), rows, -1).max(axis=0, initial=-1)
+        positions.append(before)
+    return np.array(positions)
+
+
+def _at(frame, positions):
+    """Values of `frame` at one row position per column; NaN where the position is -1"""
+    values = np.asarray(frame, dtype=float)
+    found = positions >= 0
+    out = np.full(len(positions), np.nan)
+    out[found] = values[positions[found], np.flatnonzero(found)]
+    return out
+
+
+def latest_snapshot(panel, computed, pivots=None):
+    """
+    One row per symbol with the latest values and trend flags, ready for `screen`.
+    Each symbol is read at its own last bar, so one that did not trade on the
+    panel's last date is not misread as NaN; `stale` marks those symbols.
+    `flipped_bullish`/`flipped_bearish` are True when the trend side changed on the last bar,
+    `crossed_r1`/`crossed_s1` when the close moved above R1 / below S1 on the last bar.
+    """
+    close = panel['Close']
+    last, prev, prev2 = _last_bars(close.to_numpy(dtype=float))
+    last_close, prev_close = _at(close, last), _at(close, prev)
+    trend, prev_trend = _at(computed['supertrend'], last), _at(computed['supertrend'], prev)
+    if pivots is None:
+        # Levels in force on a bar come from the symbol's bar before it
+        fields = ('High', 'Low', 'Close')
+        levels = indicators.pivot_levels(*(_at(panel[field], prev) for field in fields))
+        prev_levels = indicators.pivot_levels(*(_at(panel[field], prev2) for field in fields))
+        r1 = [levels['Resistance 1'], prev_levels['Resistance 1']]
+        s1 = [levels['Support 1'], prev_levels['Support 1']]
+    else:
+        r1 = [_at(pivots['Resistance 1'], last), _at(pivots['Resistance 1'], prev)]
+        s1 = [_at(pivots['Support 1'], last), _at(pivots['Support 1'], prev)]
+
+    bullish = last_close > trend
+    has_prev = prev >= 0
+    prev_bullish = prev_close > prev_trend
+    snapshot = pd.DataFrame({
+        'Close': last_close,
+        'change_pct': (last_close / prev_close - 1) * 100,
+        'MA20': _at(computed['MA20'], last),
+        'RSI': _at(computed['RSI'], last),
+        'ATR': _at(computed['atr'], last),
+        'supertrend': trend,
+        'bullish': bullish,
+        'R1': r1[0],
+        'S1': s1[0],
+        'flipped_bullish': has_prev & bullish & ~prev_bullish,
+        'flipped_bearish': has_prev & ~bullish & prev_bullish,
+        'crossed_r1': has_prev & (last_close > r1[0]) & (prev_close <= r1[1]),
+        'crossed_s1': has_prev & (last_close < s1[0]) & (prev_close >= s1[1]),
+        'stale': last < len(close) - 1,
+    }, index=close.columns)
+    snapshot.index.name = 'Symbol'
+    return snapshot
+
+
+def screen(snapshot, query=None, sort_by=None, ascending=True):
+    """
+    Filter the snapshot with a pandas query string and optionally rank it,
+    e.g. screen(snap, "RSI < 30 and flipped_bullish", sort_by='RSI') or screen(snap, "crossed_r1")
+    """
+    result = snapshot.query(query) if query else snapshot
+    if sort_by:
+        result = result.sort_values(sort_by, ascending=ascending)
+    return result
+
+
+def run_screener(symbols, period='1y', query=None, sort_by=None, ascending=True):
+    """Load `symbols`, compute the panel and apply `query`. Returns (result, errors)"""
+    from utils import get_histories
+    frames, errors = get_histories(symbols, period)
+    if not frames:
+        return pd.DataFrame(), errors
+    panel = build_panel(frames)
+    snapshot = latest_snapshot(panel, compute_panel(panel))
+    return screen(snapshot, query, sort_by, ascending), errors
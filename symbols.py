@@ -0,0 +1,183 @@
+"""
+Local index of NSE listings for symbol search and validation.
+
+The listing is read from assets/nse_equity_list.csv, which uses the column
+names of NSE's EQUITY_L.csv (SYMBOL, NAME OF COMPANY, SERIES, ISIN NUMBER),
+so the full exchange file can be dropped in as-is or fetched with
+
+    python symbols.py --refresh
+
+The bundled file covers the NIFTY 50 names and leaves ISIN blank; a
+refreshed file fills it in. Only a full file (every row with an ISIN) is
+`exhaustive`, i.e. proves that a symbol missing from it does not trade.
+Lookups are dictionary hits, prefix completion walks a trie of symbols and
+name words, and typos fall back to difflib.
+"""
+import argparse
+import csv
+import difflib
+import os
+import threading
+from collections import namedtuple
+
+LISTING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'nse_equity_list.csv')
+NSE_LISTING_URL = 'https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv'
+
+# Series that trade in the normal market and have Yahoo '.NS' quotes
+TRADED_SERIES = {'EQ', 'BE', 'BZ'}
+
+Listing = namedtuple('Listing', ['symbol', 'name', 'series', 'isin'])
+
+
+class _TrieNode:
+    __slots__ = ('children', 'symbols')
+
+    def __init__(self):
+        self.children = {}
+        self.symbols = []
+
+
+class SymbolIndex:
+    """Exact, prefix and fuzzy lookup over exchange listings"""
+
+    def __init__(self, listings):
+        self._by_symbol = {}
+        for listing in listings:
+            self._by_symbol.setdefault(listing.symbol, listing)
+        self._root = _TrieNode()
+        for listing in self._by_symbol.values():
+            self._insert(listing.symbol.lower(), listing.symbol)
+            for word in listing.name.lower().replace('.', ' ').split():
+                self._insert(word, listing.symbol)
+        # A full exchange file fills in every ISIN
+        self.exhaustive = bool(self._by_symbol) and all(listing.isin for listing in self._by_symbol.values())
+
+    @classmethod
+    def from_csv(cls, path=LISTING_PATH):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            # NSE pads some header names with spaces
+            rows = [{key.strip(): (value or '').strip() for key, value in row.items() if key} for row in reader]
+        return cls(
+            Listing(row['SYMBOL'].upper(), row.get('NAME OF COMPANY', ''),
+                    row.get('SERIES', 'EQ'), row.get('ISIN NUMBER', ''))
+            for row in rows
+            if row.get('SYMBOL') and row.get('SERIES', 'EQ') in TRADED_SERIES
+        )
+
+    def _insert(self, key, symbol):
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+        if symbol not in node.symbols:
+            node.symbols.append(symbol)
+
+    def __len__(self):
+        return len(self._by_symbol)
+
+    def __iter__(self):
+        return iter(self._by_symbol.values())
+
+    def get(self, symbol):
+        """Listing for `symbol` (with or without '.NS'), or None"""
+        symbol = symbol.strip().upper()
+        if symbol.endswith('.NS'):
+            symbol = symbol[:-3]
+        return self._by_symbol.get(symbol)
+
+    def resolve(self, text):
+        """Yahoo symbol ('XYZ.NS') for a listed symbol, None for anything unknown"""
+        listing = self.get(text)
+        return f"{listing.symbol}.NS" if listing else None
+
+    def complete(self, prefix, limit=10):
+        """Listings whose symbol or a word of whose name starts with `prefix`"""
+        node = self._root
+        for char in prefix.strip().lower():
+            node = node.children.get(char)
+            if node is None:
+                return []
+        found = []
+        seen = set()
+        stack = [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            for symbol in node.symbols:
+                if symbol not in seen:
+                    seen.add(symbol)
+                    found.append(self._by_symbol[symbol])
+            # Pushed in reverse so children pop in alphabetical order
+            stack.extend(node.children[char] for char in sorted(node.children, reverse=True))
+        return found[:limit]
+
+    def search(self, text, limit=10):
+        """
+        Autocomplete candidates for free text: the exact symbol first, then
+        prefix matches on symbols and name words, then close spellings.
+        """
+        text = text.strip()
+        if not text:
+            return []
+        results = []
+        exact = self.get(text)
+        if exact:
+            results.append(exact)
+        for listing in self.complete(text.upper().removesuffix('.NS'), limit):
+            if listing not in results:
+                results.append(listing)
+        if len(results) < limit:
+            close = difflib.get_close_matches(text.upper().removesuffix('.NS'), list(self._by_symbol),
+                                              n=limit, cutoff=0.6)
+            for symbol in close:
+                listing = self._by_symbol[symbol]
+                if listing not in results:
+                    results.append(listing)
+        return results[:limit]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_symbol_index():
+    """The process-wide index, loaded from the bundled listing on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SymbolIndex.from_csv(os.environ.get('NSE_LISTING_PATH', LISTING_PATH))
+    return _index
+
+
+def refresh_listing(url=NSE_LISTING_URL, path=LISTING_PATH):
+    """Replace the listing file with the current one from NSE. Returns the number of rows"""
+    global _index
+    from urllib.request import Request, urlopen
+    # NSE rejects requests without a browser-like user agent
+    request = Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    with urlopen(request, timeout=30) as response:
+        content = response.read()
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    rows = len(SymbolIndex.from_csv(tmp))
+    os.replace(tmp, path)
+    _index = None
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search or refresh the NSE symbol listing")
+    parser.add_argument('query', nargs='?', help="Symbol or company name prefix")
+    parser.add_argument('--refresh', action='store_true', help=f"Download {NSE_LISTING_URL}")
+    args = parser.parse_args()
+
+    if args.refresh:
+        print(f"Saved {refresh_listing()} listings to {LISTING_PATH}")
+    if args.query:
+        for listing in get_symbol_index().search(args.query):
+            print(f"{listing.symbol:12s} {listing.series:3s} {listing.isin or '-':12s} {listing.name}")
+
+
+if __name__ == '__main__':
+    main()
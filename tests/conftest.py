@@ -0,0 +1,28 @@
+import pytest
+from providers import SyntheticProvider
+
+
+class RecordingProvider(SyntheticProvider):
+    """Synthetic bars ending today, recording each request; `scale` re-adjusts every bar"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.batches = []
+        self.scale = 1.0
+
+    def history(self, symbol, period=None, start=None, interval='1d'):
+        self.calls.append((period, start))
+        hist = super().history(symbol, period=period, start=start, interval=interval)
+        hist[['Open', 'High', 'Low', 'Close']] *= self.scale
+        return hist
+
+    def histories(self, symbols, period=None, start=None, interval='1d'):
+        self.batches.append((sorted(symbols), period, start))
+        return super().histories(symbols, period, start, interval)
+
+
+@pytest.fixture
+def recording():
+    """A fresh RecordingProvider"""
+    return RecordingProvider()
@@ -0,0 +1,65 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import backfill as backfill_module
+from backfill import backfill, _has_head, _is_current, _latest_session
+from columnar import ColumnarPriceStore
+from providers import storage_key
+
+
+def test_latest_session_includes_today_after_the_close():
+    # Friday 2024-06-28
+    assert _latest_session(datetime(2024, 6, 28, 16, 30)) == datetime(2024, 6, 28).date()
+    assert _latest_session(datetime(2024, 6, 28, 15, 0)) == datetime(2024, 6, 27).date()
+    # Weekend and Monday morning fall back to Friday
+    assert _latest_session(datetime(2024, 6, 30, 12, 0)) == datetime(2024, 6, 28).date()
+    assert _latest_session(datetime(2024, 7, 1, 9, 0)) == datetime(2024, 6, 28).date()
+
+
+def test_post_close_run_is_not_current_with_yesterdays_bar():
+    now = datetime(2024, 6, 28, 16, 30)
+    assert not _is_current(pd.Timestamp('2024-06-27'), now)
+    assert _is_current(pd.Timestamp('2024-06-28'), now)
+
+
+def test_head_coverage_is_checked_against_the_period():
+    now = datetime(2024, 6, 28, 16, 30)
+    assert not _has_head(pd.Timestamp('2024-05-28'), '5y', now)
+    assert _has_head(pd.Timestamp('2019-06-28'), '5y', now)
+    assert _has_head(pd.Timestamp('2024-05-28'), 'max', now)
+
+
+@pytest.fixture
+def stored(recording, tmp_path, monkeypatch):
+    """(provider, store) with a 1y history stored up to three bars ago"""
+    provider = recording
+    store = ColumnarPriceStore(str(tmp_path))
+    monkeypatch.setattr(backfill_module, 'init_db', lambda: None)
+    monkeypatch.setattr(backfill_module, 'get_price_store', lambda: store)
+    monkeypatch.setattr(backfill_module, 'get_provider', lambda: provider)
+    store.upsert_prices(storage_key('TCS.NS', provider), provider.history('TCS.NS', period='1y').iloc[:-3])
+    provider.calls.clear()
+    return provider, store
+
+
+def test_top_up_starts_at_the_bar_before_the_last(stored):
+    provider, store = stored
+    before = store.load_prices(storage_key('TCS.NS', provider))
+    result = backfill(['TCS.NS'], '1y', log=lambda message: None)
+    assert provider.calls == [(None, before.index[-2].strftime('%Y-%m-%d'))]
+    assert result['readjusted'] == []
+    after = store.load_prices(storage_key('TCS.NS', provider))
+    np.testing.assert_allclose(after['Close'], provider.history('TCS.NS', period='1y')['Close'])
+
+
+def test_readjusted_history_is_replaced_for_the_whole_period(stored):
+    provider, store = stored
+    provider.scale = 0.5
+    result = backfill(['TCS.NS'], '1y', log=lambda message: None)
+    assert [period for period, _ in provider.calls] == [None, '1y']
+    assert result['readjusted'] == ['TCS.NS']
+    after = store.load_prices(storage_key('TCS.NS', provider))
+    expected = provider.history('TCS.NS', period='1y')
+    pd.testing.assert_index_equal(after.index, expected.index, exact=False, check_names=False)
+    np.testing.assert_allclose(after['Close'], expected['Close'])
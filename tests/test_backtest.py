@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from backtest import evaluate
+
+
+def test_round_trip_pays_entry_and_exit_fees():
+    close = np.full(6, 100.0)
+    position = np.array([0, 1, 1, 0, 0, 0], dtype=float)
+    metrics = evaluate(close, position, fee_bps=100)
+    assert metrics['trades'][0] == 1
+    assert metrics['total_return_pct'][0] == pytest.approx(-1.99)
+    assert metrics['avg_trade_pct'][0] == pytest.approx(-1.99)
+    assert metrics['hit_rate_pct'][0] == 0
+
+
+def reference_trades(close, position, fee_bps):
+    """Per-trade returns from a plain loop over a single symbol"""
+    trades, growth, held = [], 1.0, 0.0
+    for t in range(1, len(close)):
+        previous, held = held, position[t - 1]
+        step = held * (close[t] / close[t - 1] - 1) - abs(held - previous) * fee_bps / 10_000
+        if held > 0 and previous == 0:
+            growth = 1.0
+        if held > 0 or previous > 0:
+            growth *= 1 + step
+        if held == 0 and previous > 0:
+            trades.append(growth - 1)
+    if held > 0:
+        trades.append(growth - 1)
+    return trades
+
+
+def test_trade_pnl_matches_a_loop():
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (300, 3)), axis=0))
+    position = (rng.random((300, 3)) > 0.6).astype(float)
+    metrics = evaluate(close, position, fee_bps=10)
+    for symbol in range(3):
+        trades = reference_trades(close[:, symbol], position[:, symbol], 10)
+        assert metrics['trades'][symbol] == len(trades)
+        assert metrics['avg_trade_pct'][symbol] == pytest.approx(100 * np.mean(trades))
+
+
+def test_position_still_open_at_the_end():
+    close = np.array([100.0, 100.0, 110.0, 121.0])
+    position = np.array([1, 1, 1, 1], dtype=float)
+    metrics = evaluate(close, position, fee_bps=0)
+    assert metrics['trades'][0] == 1
+    assert metrics['avg_trade_pct'][0] == pytest.approx(21.0)
@@ -0,0 +1,115 @@
+import threading
+import time
+import numpy as np
+import pytest
+from datacache import SharedCache
+
+WAITERS = 8
+
+
+def run_together(cache, key, loader):
+    """Call get_or_load from WAITERS threads; returns (results, errors)"""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(cache.get_or_load(key, loader))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(WAITERS)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def wait_for_waiters(cache, kind):
+    """Block until every thread but the loading one is waiting on it"""
+    deadline = time.monotonic() + 10
+    while cache.stats()['kinds'].get(kind, {}).get('coalesced', 0) < WAITERS - 1:
+        assert time.monotonic() < deadline, "waiters never arrived"
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_share_one_load():
+    cache = SharedCache()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(10)
+        return 'bars'
+
+    threads, results, errors = run_together(cache, ('history', 'TCS'), loader)
+    wait_for_waiters(cache, 'history')
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['bars'] * WAITERS and not errors
+    counts = cache.stats()['kinds']['history']
+    assert counts['misses'] == 1 and counts['coalesced'] == WAITERS - 1
+    assert cache.get_or_load(('history', 'TCS'), lambda: 'reloaded') == 'bars'
+
+
+def test_a_failed_load_reaches_every_waiter_and_is_not_cached():
+    cache = SharedCache()
+    release = threading.Event()
+
+    def loader():
+        release.wait(10)
+        raise ValueError("provider down")
+
+    threads, results, errors = run_together(cache, ('history', 'INFY'), loader)
+    wait_for_waiters(cache, 'history')
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert not results
+    assert len(errors) == WAITERS
+    assert all(isinstance(e, ValueError) and str(e) == "provider down" for e in errors)
+    assert cache.stats()['entries'] == 0 and cache.stats()['in_flight'] == 0
+    assert cache.get_or_load(('history', 'INFY'), lambda: 'recovered') == 'recovered'
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = SharedCache()
+    assert cache.get_or_load(('history', 'TCS'), lambda: 1, ttl=300) == 1
+    now[0] += 299
+    assert cache.get_or_load(('history', 'TCS'), lambda: 2, ttl=300) == 1
+    now[0] += 2
+    assert cache.get_or_load(('history', 'TCS'), lambda: 3, ttl=300) == 3
+    # Without a ttl an entry stays until it is evicted
+    assert cache.get_or_load(('indicators', 'TCS'), lambda: 4) == 4
+    now[0] += 10**6
+    assert cache.get_or_load(('indicators', 'TCS'), lambda: 5) == 4
+
+
+def test_least_recently_used_entries_are_evicted_over_budget():
+    block = np.zeros(1000)   # 8000 bytes
+    cache = SharedCache(max_bytes=3 * block.nbytes)
+    for name in 'abc':
+        cache.get_or_load(('history', name), lambda: block.copy())
+    # Touch 'a' so 'b' is the least recently used
+    cache.get_or_load(('history', 'a'), lambda: pytest.fail("'a' should still be cached"))
+    cache.get_or_load(('history', 'd'), lambda: block.copy())
+
+    stats = cache.stats()
+    assert stats['entries'] == 3 and stats['bytes'] <= stats['max_bytes']
+    assert stats['kinds']['history']['evictions'] == 1
+    assert cache.get_or_load(('history', 'b'), lambda: 'reloaded') == 'reloaded'
+
+
+def test_values_larger_than_the_budget_are_returned_but_not_kept():
+    cache = SharedCache(max_bytes=1000)
+    cache.get_or_load(('history', 'small'), lambda: np.zeros(10))
+    big = cache.get_or_load(('history', 'big'), lambda: np.zeros(1000))
+    assert len(big) == 1000
+    stats = cache.stats()
+    assert stats['entries'] == 1 and stats['bytes'] <= 1000
+    assert cache.get_or_load(('history', 'big'), lambda: 'reloaded') == 'reloaded'
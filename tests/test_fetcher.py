@@ -0,0 +1,143 @@
+"""
+fetcher.py against a local stub of Yahoo's chart API (http.server on a
+random port), so retries, errors and connection reuse run over real sockets.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import numpy as np
+import pandas as pd
+import pytest
+from fetcher import ChartFetcher, FetchError, parse_chart
+
+DAYS = pd.date_range('2024-06-24 09:15', periods=5, freq='D', tz='Asia/Kolkata')
+
+
+def chart_payload(closes, adjclose=None, timestamps=None):
+    timestamps = [int(ts.timestamp()) for ts in DAYS[:len(closes)]] if timestamps is None else timestamps
+    indicators = {'quote': [{'open': closes, 'high': closes, 'low': closes, 'close': closes,
+                             'volume': [1000] * len(closes)}]}
+    if adjclose is not None:
+        indicators['adjclose'] = [{'adjclose': adjclose}]
+    return {'chart': {'result': [{'meta': {'exchangeTimezoneName': 'Asia/Kolkata'},
+                                  'timestamp': timestamps, 'indicators': indicators}], 'error': None}}
+
+
+class StubChartHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so one handler instance serves one connection
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        symbol = urlsplit(self.path).path.rsplit('/', 1)[-1]
+        with self.server.lock:
+            self.server.requests[symbol] += 1
+            attempt = self.server.requests[symbol]
+        if symbol == 'THROTTLED' and attempt == 1:
+            self.reply(429, {'chart': {'result': None, 'error': None}}, {'Retry-After': '0.3'})
+        elif symbol == 'MISSING':
+            self.reply(404, {'chart': {'result': None, 'error': {
+                'code': 'Not Found', 'description': 'No data found, symbol may be delisted'}}})
+        else:
+            time.sleep(self.server.delay)
+            self.reply(200, chart_payload([100.0, 101.0, 102.0]))
+
+    def reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubChartHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = Counter()
+    server.connections = 0
+    server.delay = 0.0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_fetcher(server, concurrency=4):
+    return ChartFetcher(f"http://127.0.0.1:{server.server_port}/chart", rate=1000, burst=1000,
+                        concurrency=concurrency, retries=2, timeout=5)
+
+
+def test_throttled_request_waits_out_retry_after_then_succeeds(stub):
+    fetcher = make_fetcher(stub)
+    started = time.monotonic()
+    hist = asyncio.run(fetcher.history('THROTTLED', period='5d'))
+    fetcher.close()
+    assert time.monotonic() - started >= 0.3
+    assert stub.requests['THROTTLED'] == 2
+    assert hist['Close'].tolist() == [100.0, 101.0, 102.0]
+
+
+def test_not_found_fails_once_with_yahoos_description(stub):
+    fetcher = make_fetcher(stub)
+    with pytest.raises(FetchError) as error:
+        asyncio.run(fetcher.history('MISSING', period='5d'))
+    fetcher.close()
+    assert error.value.status == 404
+    assert 'No data found, symbol may be delisted' in str(error.value)
+    assert stub.requests['MISSING'] == 1
+
+
+def test_connections_are_pooled_across_requests(stub):
+    stub.delay = 0.01
+    fetcher = make_fetcher(stub, concurrency=4)
+    symbols = [f"S{i}" for i in range(40)]
+    frames, errors = asyncio.run(fetcher.histories(symbols, period='5d'))
+    fetcher.close()
+    assert errors == {}
+    assert sorted(frames) == sorted(symbols)
+    assert sum(stub.requests.values()) == 40
+    assert stub.connections <= 4
+
+
+def test_parse_chart_adjusts_and_drops_duplicate_and_null_bars():
+    timestamps = [int(ts.timestamp()) for ts in DAYS[:4]]
+    # A halted bar, then the live bar repeated with a later price
+    timestamps.append(timestamps[-1] + 60)
+    payload = chart_payload([100.0, 200.0, None, 300.0, 310.0],
+                            adjclose=[50.0, 100.0, None, 150.0, 155.0], timestamps=timestamps)
+    payload['chart']['result'][0]['indicators']['quote'][0]['volume'][2] = None
+    hist = parse_chart(payload)
+    assert hist.index.tolist() == [DAYS[0].tz_localize(None).normalize(),
+                                   DAYS[1].tz_localize(None).normalize(),
+                                   DAYS[3].tz_localize(None).normalize()]
+    np.testing.assert_allclose(hist['Close'], [50.0, 100.0, 155.0])
+    np.testing.assert_allclose(hist['Open'], [50.0, 100.0, 155.0])
+    assert hist['Volume'].dtype == np.int64
+
+
+def test_default_limits_let_a_cold_universe_out_at_once(stub):
+    stub.delay = 0.01
+    fetcher = ChartFetcher(f"http://127.0.0.1:{stub.server_port}/chart")
+    symbols = [f"S{i}" for i in range(50)]
+    started = time.monotonic()
+    frames, errors = asyncio.run(fetcher.histories(symbols, period='1y'))
+    fetcher.close()
+    assert len(frames) == 50 and errors == {}
+    # Held to FETCH_RATE this would take (50 - burst) / rate seconds
+    assert time.monotonic() - started < 2
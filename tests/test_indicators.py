@@ -0,0 +1,151 @@
+"""
+Golden tests: the vectorised indicators against the original pandas
+implementation of calculate_indicators, on fixed random bars.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import indicators
+from utils import calculate_indicators
+
+
+def baseline_indicators(df):
+    """The original row-by-row calculate_indicators, kept as the reference"""
+    df['MA20'] = df['Close'].rolling(window=20).mean()
+
+    delta = df['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    df['RSI'] = 100 - (100 / (1 + rs))
+
+    period = 10
+    multiplier = 3
+    df['tr0'] = abs(df['High'] - df['Low'])
+    df['tr1'] = abs(df['High'] - df['Close'].shift(1))
+    df['tr2'] = abs(df['Low'] - df['Close'].shift(1))
+    df['tr'] = df[['tr0', 'tr1', 'tr2']].max(axis=1)
+    df['atr'] = df['tr'].rolling(period).mean()
+
+    hl2 = (df['High'] + df['Low']) / 2
+    df['basic_ub'] = hl2 + (multiplier * df['atr'])
+    df['basic_lb'] = hl2 - (multiplier * df['atr'])
+
+    # Same loops as the original, on lists instead of chained .iat assignment
+    close = df['Close'].tolist()
+    basic_ub = df['basic_ub'].tolist()
+    basic_lb = df['basic_lb'].tolist()
+    final_ub = [0.0] * len(df)
+    final_lb = [0.0] * len(df)
+    for i in range(period, len(df)):
+        final_ub[i] = basic_ub[i] if basic_ub[i] < final_ub[i - 1] or close[i - 1] > final_ub[i - 1] else final_ub[i - 1]
+        final_lb[i] = basic_lb[i] if basic_lb[i] > final_lb[i - 1] or close[i - 1] < final_lb[i - 1] else final_lb[i - 1]
+    supertrend = [0.0] * len(df)
+    for i in range(period, len(df)):
+        supertrend[i] = final_ub[i] if close[i] <= final_ub[i] else final_lb[i]
+    df['final_ub'] = final_ub
+    df['final_lb'] = final_lb
+    df['supertrend'] = supertrend
+    return df
+
+
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = close * (1 + rng.normal(0, 0.003, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, n)))
+    volume = rng.integers(100_000, 1_000_000, n)
+    index = pd.date_range('2020-01-01', periods=n, freq='D', name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+
+def assert_matches_baseline(df):
+    expected = baseline_indicators(df.copy())
+    actual = calculate_indicators(df.copy())
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=1e-10, atol=1e-9)
+
+
+@pytest.mark.parametrize('n', [0, 1, 5, 10, 11, 15, 20, 250, 3000])
+def test_matches_baseline(n):
+    assert_matches_baseline(make_bars(n, seed=n))
+
+
+def test_matches_baseline_with_nan_bars():
+    df = make_bars(400, seed=7)
+    df.iloc[[30, 31, 200], df.columns.get_loc('Close')] = np.nan
+    df.iloc[100, df.columns.get_loc('High')] = np.nan
+    df.iloc[150, df.columns.get_loc('Low')] = np.nan
+    assert_matches_baseline(df)
+
+
+def test_flat_prices():
+    # No losses and no gains: RSI is undefined, ATR is zero
+    df = make_bars(60, seed=1)
+    df[['Open', 'High', 'Low', 'Close']] = 100.0
+    assert_matches_baseline(df)
+
+
+@pytest.mark.parametrize('dtype', [None, 'float32'])
+def test_lean_matches_baseline(dtype):
+    df = make_bars(500, seed=3)
+    expected = baseline_indicators(df.copy())
+    lean = calculate_indicators(df, lean=True, dtype=dtype)
+    assert 'tr' not in df.columns
+    assert list(lean.columns) == list(df.columns) + indicators.LEAN_COLUMNS
+    tolerance = 1e-5 if dtype else 1e-10
+    for column in indicators.LEAN_COLUMNS:
+        np.testing.assert_allclose(lean[column], expected[column], rtol=tolerance, equal_nan=True)
+
+
+def test_incremental_matches_batch():
+    df = make_bars(300, seed=5)
+    expected = baseline_indicators(df.copy())
+    live = indicators.IncrementalIndicators.from_history(df['High'][:100], df['Low'][:100], df['Close'][:100])
+    state = indicators.IncrementalIndicators.from_state(live.to_state())
+    rows = [state.update(bar) for bar in df.iloc[100:].to_dict('records')]
+    for column in ('MA20', 'RSI', 'atr', 'supertrend'):
+        np.testing.assert_allclose([row[column] for row in rows], expected[column][100:],
+                                   rtol=1e-10, equal_nan=True)
+
+
+def test_grid_matches_pipeline_for_every_combination():
+    df = make_bars(600, seed=11)
+    df.iloc[[40, 41, 300], df.columns.get_loc('Close')] = np.nan
+    df.iloc[120, df.columns.get_loc('High')] = np.nan
+    df.iloc[450, df.columns.get_loc('Low')] = np.nan
+    windows = [2, 5, 14, 20, 50]
+    periods = [3, 7, 10, 21]
+    multipliers = [1.0, 2.5, 3.0]
+    grid = indicators.indicator_grid(df['High'], df['Low'], df['Close'], windows, windows, periods, multipliers)
+
+    for row, window in enumerate(windows):
+        pipeline = indicators.IndicatorPipeline(df['High'], df['Low'], df['Close'],
+                                                ma_window=window, rsi_window=window)
+        np.testing.assert_allclose(grid['MA'][row], pipeline['MA20'], rtol=1e-10, equal_nan=True)
+        np.testing.assert_allclose(grid['RSI'][row], pipeline['RSI'], rtol=1e-10, atol=1e-9, equal_nan=True)
+    # Every column shares one recursion started at the shortest period
+    for p, period in enumerate(periods):
+        for m, multiplier in enumerate(multipliers):
+            pipeline = indicators.IndicatorPipeline(df['High'], df['Low'], df['Close'],
+                                                    supertrend_period=period, supertrend_multiplier=multiplier)
+            np.testing.assert_allclose(grid['atr'][p], pipeline['atr'], rtol=1e-10, equal_nan=True)
+            np.testing.assert_allclose(grid['supertrend'][p, m], pipeline['supertrend'],
+                                       rtol=1e-10, atol=1e-9, equal_nan=True, err_msg=f"{period}x{multiplier}")
+
+
+@pytest.mark.parametrize('method, expected', [
+    ('classic', [105.3333, 110.6667, 115.3333, 120.6667, 130.6667, 100.6667, 95.3333, 90.6667, 80.6667]),
+    ('fibonacci', [105.3333, 109.1533, 111.5133, 115.3333, 121.5133, 101.5133, 99.1533, 95.3333, 89.1533]),
+    ('camarilla', [105.3333, 106.9167, 107.8333, 108.75, 111.5, 105.0833, 104.1667, 103.25, 100.5]),
+])
+def test_pivot_levels_by_method(method, expected):
+    levels = indicators.pivot_levels(110.0, 100.0, 106.0, method)
+    assert list(levels) == indicators.PIVOT_LEVELS
+    np.testing.assert_allclose([float(value) for value in levels.values()], expected, atol=5e-5)
+
+
+def test_unknown_pivot_method():
+    with pytest.raises(ValueError):
+        indicators.pivot_levels(110.0, 100.0, 106.0, 'woodie')
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import materialize
+from columnar import ColumnarPriceStore
+from materialize import _derive, _pending_bars
+from providers import SyntheticProvider
+
+
+def bars(n=300):
+    return SyntheticProvider(end='2024-06-28').history('TCS.NS', period='5y').iloc[-n:]
+
+
+def test_state_is_taken_one_bar_before_the_last():
+    history = bars()
+    frame, pivots, state, state_date = _derive(history)
+    assert state_date == history.index[-2]
+    assert state['prev_close'] == history['Close'].iloc[-2]
+    assert frame.index.equals(history.index)
+    assert all(levels.index.equals(history.index) for levels in pivots.values())
+
+
+def test_incremental_run_rederives_a_revised_last_bar():
+    history = bars()
+    _, _, state, state_date = _derive(history.iloc[:-3])
+
+    # The last materialized bar is revised and two more arrive
+    revised = history.iloc[-4:].copy()
+    revised.iloc[0, revised.columns.get_loc('Close')] *= 1.1
+    revised['High'] = revised[['High', 'Close']].max(axis=1)
+    updated = pd.concat([history.iloc[:-4], revised])
+    assert state_date == updated.index[-5]
+
+    frame, pivots, state, state_date = _derive(updated.loc[state_date:], state)
+    expected, expected_pivots, expected_state, _ = _derive(updated)
+    assert frame.index.equals(updated.index[-4:])
+    np.testing.assert_allclose(frame.to_numpy(), expected.iloc[-4:].to_numpy())
+    for method, levels in pivots.items():
+        np.testing.assert_allclose(levels.to_numpy(), expected_pivots[method].iloc[-4:].to_numpy())
+    assert state_date == updated.index[-2]
+    assert state['prev_close'] == expected_state['prev_close']
+
+
+def test_single_bar_keeps_its_own_state():
+    history = bars(1)
+    _, _, state, state_date = _derive(history)
+    assert state_date == history.index[0]
+    assert state['prev_close'] == history['Close'].iloc[0]
+
+
+def test_history_extended_backwards_is_derived_in_full(tmp_path, monkeypatch):
+    history = bars()
+    store = ColumnarPriceStore(str(tmp_path))
+    store.upsert_prices('TCS.NS', history.iloc[100:])
+    frame, _, state, state_date = _derive(history.iloc[100:])
+    monkeypatch.setattr(materialize, 'load_derived_state', lambda key: (state_date.to_pydatetime(), state))
+    derived = (frame.index[0], frame.index[-1])
+
+    pending, pending_state = _pending_bars(store, 'TCS.NS', derived, store.price_ranges(['TCS.NS'])['TCS.NS'])
+    assert pending_state is not None
+    assert pending.index[0] == state_date
+
+    # A longer backfill stores bars before the first materialized row
+    store.upsert_prices('TCS.NS', history.iloc[:100])
+    pending, pending_state = _pending_bars(store, 'TCS.NS', derived, store.price_ranges(['TCS.NS'])['TCS.NS'])
+    assert pending_state is None
+    assert pending.index.equals(history.index)
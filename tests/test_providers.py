@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+from providers import MarketDataProvider, RecordReplayProvider, SyntheticProvider
+
+
+def test_synthetic_period_ends_at_end_date():
+    provider = SyntheticProvider(end='2020-06-30')
+    daily = provider.history('TCS.NS', period='1y')
+    assert daily.index[-1] == pd.Timestamp('2020-06-30')
+    assert daily.index[0] >= pd.Timestamp('2019-06-30')
+    assert len(daily) > 250
+
+    intraday = provider.history('TCS.NS', period='5d', interval='15m')
+    assert not intraday.empty
+    assert intraday.index[-1].normalize() == pd.Timestamp('2020-06-30')
+
+
+def test_synthetic_is_deterministic():
+    first = SyntheticProvider(end='2020-06-30').history('INFY.NS', period='1mo')
+    second = SyntheticProvider(end='2020-06-30').history('INFY.NS', period='1mo')
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_provider_interface_is_abstract():
+    with pytest.raises(TypeError):
+        MarketDataProvider()
+
+
+def test_recorded_fixtures_replay_without_the_inner_provider(tmp_path):
+    inner = SyntheticProvider(end='2020-06-30')
+    recorder = RecordReplayProvider(str(tmp_path), mode='record', inner=inner)
+    recorded = recorder.history('TCS.NS', period='1y')
+    recorded_info = recorder.info('TCS.NS')
+
+    replay = RecordReplayProvider(str(tmp_path), mode='replay')
+    # Replaying must never reach the default Yahoo provider
+    replay.inner = None
+    pd.testing.assert_frame_equal(replay.history('TCS.NS', period='1y'), recorded,
+                                  check_freq=False, check_index_type=False)
+    assert replay.info('TCS.NS') == recorded_info
+    with pytest.raises(FileNotFoundError):
+        replay.history('INFY.NS', period='1y')
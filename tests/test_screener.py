@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import screener
+from providers import SyntheticProvider
+from utils import calculate_indicators
+
+
+def snapshot(frames, with_pivots=False):
+    panel = screener.build_panel(frames)
+    computed = screener.compute_panel(panel)
+    pivots = screener.panel_pivots(panel) if with_pivots else None
+    return screener.latest_snapshot(panel, computed, pivots)
+
+
+def test_symbol_missing_last_date_is_read_at_its_own_last_bar():
+    provider = SyntheticProvider(end='2024-06-28')
+    frames = {symbol: provider.history(symbol, period='1y') for symbol in ('A.NS', 'B.NS', 'C.NS')}
+    frames['C.NS'] = frames['C.NS'].iloc[:-1]
+
+    alone = snapshot({'C.NS': frames['C.NS']}).loc['C.NS']
+    for with_pivots in (False, True):
+        row = snapshot(frames, with_pivots).loc['C.NS']
+        assert row['stale']
+        pd.testing.assert_series_equal(row.drop('stale'), alone.drop('stale'), check_names=False)
+    assert not snapshot(frames).loc['A.NS', 'stale']
+
+
+def test_pivot_sources_agree():
+    provider = SyntheticProvider(end='2024-06-28')
+    frames = {symbol: provider.history(symbol, period='6mo') for symbol in ('A.NS', 'B.NS')}
+    pd.testing.assert_frame_equal(snapshot(frames), snapshot(frames, with_pivots=True))
+
+
+def test_late_listed_symbol_matches_its_own_calculation():
+    provider = SyntheticProvider(end='2024-06-28')
+    frames = {symbol: provider.history(symbol, period='1y') for symbol in ('A.NS', 'LATE.NS')}
+    # Listed 200 bars before the end of the window
+    frames['LATE.NS'] = frames['LATE.NS'].iloc[-200:]
+    panel = screener.build_panel(frames)
+    computed = screener.compute_panel(panel)
+
+    for symbol, hist in frames.items():
+        expected = calculate_indicators(hist.copy())
+        for column in screener.SCREEN_COLUMNS:
+            np.testing.assert_allclose(computed[column][symbol].loc[hist.index], expected[column],
+                                       rtol=1e-10, equal_nan=True, err_msg=f"{symbol} {column}")
@@ -0,0 +1,69 @@
+import pytest
+from symbols import Listing, SymbolIndex
+
+LISTINGS = [
+    Listing('RELIANCE', 'Reliance Industries Ltd.', 'EQ', 'INE002A01018'),
+    Listing('HDFCBANK', 'HDFC Bank Ltd.', 'EQ', ''),
+    Listing('ICICIBANK', 'ICICI Bank Ltd.', 'EQ', ''),
+    Listing('INFY', 'Infosys Ltd.', 'EQ', ''),
+    Listing('TCS', 'Tata Consultancy Services Ltd.', 'EQ', ''),
+    Listing('TATAMOTORS', 'Tata Motors Ltd.', 'EQ', ''),
+]
+
+
+@pytest.fixture
+def index():
+    return SymbolIndex(LISTINGS)
+
+
+def symbols(listings):
+    return [listing.symbol for listing in listings]
+
+
+def test_resolve_accepts_only_listed_symbols(index):
+    assert index.resolve('tcs') == 'TCS.NS'
+    assert index.resolve(' TCS.NS ') == 'TCS.NS'
+    assert index.resolve('RELIANC') is None
+    assert index.resolve('TATA') is None
+
+
+def test_complete_matches_symbol_and_name_prefixes(index):
+    assert sorted(symbols(index.complete('tata'))) == ['TATAMOTORS', 'TCS']
+    assert symbols(index.complete('bank')) == ['HDFCBANK', 'ICICIBANK']
+    assert symbols(index.complete('infos')) == ['INFY']
+    assert len(index.complete('ta', limit=1)) == 1
+    assert index.complete('xyz') == []
+
+
+def test_search_puts_the_exact_symbol_first_then_prefixes_then_typos(index):
+    assert symbols(index.search('TCS.NS'))[0] == 'TCS'
+    assert symbols(index.search('RELIANC')) == ['RELIANCE']
+    assert symbols(index.search('ICICBANK')) == ['ICICIBANK', 'HDFCBANK']
+    assert index.search('   ') == []
+
+
+def test_from_csv_reads_the_nse_layout(tmp_path):
+    path = tmp_path / 'EQUITY_L.csv'
+    # NSE pads some header names and lists non-traded series too
+    path.write_text('SYMBOL,NAME OF COMPANY, SERIES, DATE OF LISTING, ISIN NUMBER\n'
+                    'TCS,Tata Consultancy Services Ltd.,EQ,25-AUG-2004,INE467B01029\n'
+                    'SGBJUN31,SGB 2023-24 Series I,GB,27-JUN-2023,IN0020230036\n')
+    index = SymbolIndex.from_csv(str(path))
+    assert len(index) == 1
+    assert index.get('TCS').isin == 'INE467B01029'
+    assert index.resolve('SGBJUN31') is None
+    assert index.exhaustive
+
+
+def test_only_a_listing_with_every_isin_is_exhaustive(index):
+    assert not index.exhaustive
+    assert SymbolIndex([listing._replace(isin='INE000000000') for listing in LISTINGS]).exhaustive
+    assert not SymbolIndex([]).exhaustive
+
+
+def test_bundled_listing_loads():
+    index = SymbolIndex.from_csv()
+    assert index.resolve('RELIANCE') == 'RELIANCE.NS'
+    assert len(index) >= 50
+    # The NIFTY 50 extract leaves ISIN blank, so unlisted symbols stay selectable
+    assert not index.exhaustive
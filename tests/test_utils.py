@@ -0,0 +1,209 @@
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+import utils
+from columnar import ColumnarPriceStore
+from datacache import SharedCache
+import indicators
+from indicators import IncrementalIndicators
+from providers import SyntheticProvider, set_provider, storage_key
+from utils import head_gap_days, interval_periods, source_interval, _period_days
+
+
+def test_hourly_bars_offer_two_years_clamped_to_the_provider_limit():
+    assert '2y' in interval_periods('1h')
+    assert source_interval('1h', '2y') == '1h'
+    assert _period_days('2y', '1h') < 730
+    assert _period_days('2y', '1d') == 731
+
+
+def test_minute_bars_stay_limited():
+    assert interval_periods('1m') == ['1d', '5d']
+    with pytest.raises(ValueError):
+        source_interval('5m', '3mo')
+
+
+def test_head_gap_shrinks_with_the_period():
+    # A one-day window stored earlier must not pass for five days of history
+    assert head_gap_days('5d') < 3
+    assert head_gap_days('1y') == 7
+    assert head_gap_days('max') == 7
+
+
+@pytest.fixture
+def provider(recording, tmp_path, monkeypatch):
+    """A RecordingProvider with bars stored in a columnar store under tmp_path"""
+    store = ColumnarPriceStore(str(tmp_path))
+    monkeypatch.setattr(utils, '_db', lambda: SimpleNamespace(get_price_store=lambda: store))
+    monkeypatch.setattr(utils, '_last_sync', {})
+    monkeypatch.setattr(utils, '_covered_from', {})
+    set_provider(recording)
+    yield recording
+    set_provider(None)
+
+
+def stored(provider, symbol='TCS.NS'):
+    return utils._db().get_price_store().load_prices(storage_key(symbol, provider))
+
+
+def test_second_load_fetches_the_tail_from_the_second_to_last_bar(provider, monkeypatch):
+    first = utils._load_history('TCS.NS', '1y')
+    assert provider.calls == [('1y', None)]
+
+    monkeypatch.setattr(utils, 'TAIL_REFRESH_SECONDS', 0)
+    second = utils._load_history('TCS.NS', '1y')
+    assert provider.calls[1:] == [(None, first.index[-2].strftime('%Y-%m-%d'))]
+    pd.testing.assert_frame_equal(second, first, check_freq=False, check_index_type=False)
+
+
+def test_scaled_closes_replace_the_stored_bars(provider, monkeypatch):
+    utils._load_history('TCS.NS', '2y')
+    monkeypatch.setattr(utils, 'TAIL_REFRESH_SECONDS', 0)
+    provider.scale = 0.5
+    hist = utils._load_history('TCS.NS', '1y')
+
+    # The tail showed the new basis, so the whole period came down again
+    assert [period for period, _ in provider.calls] == ['2y', None, '1y']
+    expected = SyntheticProvider().history('TCS.NS', period='1y')['Close'] * 0.5
+    np.testing.assert_allclose(hist['Close'], expected)
+    # Older bars on the old basis are gone, not left behind the new ones
+    pd.testing.assert_index_equal(stored(provider).index, expected.index, exact=False, check_names=False)
+    np.testing.assert_allclose(stored(provider)['Close'], expected)
+
+
+def test_shorter_period_is_served_from_the_database(provider):
+    longer = utils._load_history('TCS.NS', '2y')
+    shorter = utils._load_history('TCS.NS', '1y')
+    assert provider.calls == [('2y', None)]
+    assert shorter.index[0] >= utils._period_start('1y')
+    pd.testing.assert_frame_equal(shorter, longer[longer.index >= shorter.index[0]], check_freq=False, check_index_type=False)
+
+
+def test_batch_misses_go_out_as_one_request_each(provider, monkeypatch):
+    cache = SharedCache()
+    monkeypatch.setattr(utils, 'get_cache', lambda: cache)
+    symbols = ['A.NS', 'B.NS', 'C.NS']
+    frames, errors = utils.get_histories(symbols, '1y')
+    assert errors == {} and sorted(frames) == symbols
+    assert provider.batches == [(symbols, '1y', None)]
+    # The per-symbol loads that follow find everything stored
+    assert len(provider.calls) == len(symbols)
+
+    cache.clear()
+    monkeypatch.setattr(utils, 'TAIL_REFRESH_SECONDS', 0)
+    provider.scale = 0.5
+    frames, errors = utils.get_histories(symbols, '1y')
+    tail_start = frames['A.NS'].index[-2].strftime('%Y-%m-%d')
+    assert provider.batches[1:] == [(symbols, None, tail_start), (symbols, '1y', None)]
+    np.testing.assert_allclose(stored(provider, 'B.NS')['Close'], frames['B.NS']['Close'])
+
+
+class StateDb:
+    """Stand-in for the database module's indicator_state functions"""
+
+    def __init__(self):
+        self.saved = {}
+
+    def load_indicator_state(self, key):
+        return self.saved.get(key, (None, None))
+
+    def save_indicator_state(self, key, last_date, state):
+        self.saved[key] = (last_date, state)
+
+
+def assert_same_state(live, hist):
+    expected = IncrementalIndicators.from_history(hist['High'], hist['Low'], hist['Close']).to_state()
+    for name, value in live.to_state().items():
+        np.testing.assert_allclose(value, expected[name], rtol=1e-9, err_msg=name)
+
+
+def test_live_state_is_saved_one_bar_behind_and_takes_a_revised_close(monkeypatch):
+    db = StateDb()
+    monkeypatch.setattr(utils, '_db', lambda: db)
+    set_provider(SyntheticProvider(end='2024-06-28'))
+    try:
+        hist = SyntheticProvider(end='2024-06-28').history('TCS.NS', period='1y')
+        assert_same_state(utils.get_live_indicators('TCS.NS', hist), hist)
+        ((last_date, _),) = db.saved.values()
+        assert last_date == hist.index[-2]
+
+        # The session in progress closes somewhere else
+        revised = hist.copy()
+        revised.iloc[-1, revised.columns.get_loc('Close')] *= 1.02
+        revised['High'] = revised[['High', 'Close']].max(axis=1)
+        live = utils.get_live_indicators('TCS.NS', revised)
+        assert live.prev_close == revised['Close'].iloc[-1]
+        assert_same_state(live, revised)
+
+        # Once the next bar arrives the revised one is what the snapshot keeps
+        extended = pd.concat([revised, SyntheticProvider(end='2024-07-01').history('TCS.NS', period='5d').iloc[-1:]])
+        assert_same_state(utils.get_live_indicators('TCS.NS', extended), extended)
+        ((last_date, state),) = db.saved.values()
+        assert last_date == extended.index[-2]
+        assert state['prev_close'] == revised['Close'].iloc[-1]
+    finally:
+        set_provider(None)
+
+
+def test_indicators_are_recomputed_when_the_last_bar_changes(monkeypatch):
+    cache = SharedCache()
+    monkeypatch.setattr(utils, 'get_cache', lambda: cache)
+    monkeypatch.setattr(utils, '_materialized_indicators', lambda symbol, hist: None)
+    hist = SyntheticProvider(end='2024-06-28').history('TCS.NS', period='1y')
+    first = utils.get_indicators('TCS.NS', '1y', hist)
+    assert utils.get_indicators('TCS.NS', '1y', hist.copy()) is first
+
+    # The session in progress moves on under the same date
+    revised = hist.copy()
+    revised.iloc[-1, revised.columns.get_loc('Close')] *= 1.05
+    second = utils.get_indicators('TCS.NS', '1y', revised)
+    assert second['Close'].iloc[-1] == revised['Close'].iloc[-1]
+    assert second['MA20'].iloc[-1] != first['MA20'].iloc[-1]
+
+
+def test_stored_pivot_levels_from_an_unclosed_session_are_recomputed(monkeypatch):
+    hist = SyntheticProvider(end='2024-06-28').history('TCS.NS', period='1y')
+    # Materialized while the last session was still trading
+    snapshot = hist.copy()
+    snapshot.iloc[-1, snapshot.columns.get_loc('Close')] *= 0.97
+    stored_levels = indicators.pivot_levels(*snapshot.iloc[-1][['High', 'Low', 'Close']], 'classic')
+    monkeypatch.setattr(utils, '_db', lambda: SimpleNamespace(load_pivot_levels=lambda key, method, date: stored_levels))
+    set_provider(SyntheticProvider(end='2024-06-28'))
+    try:
+        assert utils.get_pivot_points('TCS.NS', hist) == utils.calculate_pivot_points(hist)
+        assert utils.get_pivot_points('TCS.NS', snapshot) == utils.calculate_pivot_points(snapshot)
+    finally:
+        set_provider(None)
+
+
+def pivot_bars():
+    """Weekday bars from Monday 2024-04-22 to Friday 2024-06-28, each period's high, low and close distinct"""
+    index = pd.bdate_range('2024-04-22', '2024-06-28')
+    i = np.arange(len(index))
+    return pd.DataFrame({'Open': 100 + i, 'High': 104 + (i * 7) % 11 + i, 'Low': 96 - (i * 3) % 5 + i,
+                         'Close': 100 + (i * 5) % 7 + i, 'Volume': 1000}, index=index, dtype=float)
+
+
+# (bar, high/low/close of the period before it) per timeframe, and the bars of its first period
+PIVOT_ALIGNMENT = {
+    'daily': ([('2024-05-06', (121, 103, 112))], 1),                             # Monday after Friday
+    'weekly': ([('2024-06-03', (141, 119, 134)), ('2024-06-07', (141, 119, 134))], 5),
+    'monthly': ([('2024-05-31', (119, 94, 108)), ('2024-06-03', (141, 100, 134))], 7),
+}
+
+
+@pytest.mark.parametrize('method', ['classic', 'fibonacci', 'camarilla'])
+@pytest.mark.parametrize('timeframe', list(PIVOT_ALIGNMENT))
+def test_pivot_series_carries_the_previous_periods_levels(timeframe, method):
+    hist = pivot_bars()
+    levels = utils.pivot_series(hist, method, timeframe)
+    assert levels.index.equals(hist.index)
+    assert list(levels.columns) == indicators.PIVOT_LEVELS
+    pinned, first_period = PIVOT_ALIGNMENT[timeframe]
+    assert levels.iloc[:first_period].isna().all().all()
+    assert levels.iloc[first_period:].notna().all().all()
+    for date, (high, low, close) in pinned:
+        expected = indicators.pivot_levels(high, low, close, method)
+        np.testing.assert_allclose(levels.loc[date].to_numpy(), [float(value) for value in expected.values()],
+                                   err_msg=f"{timeframe} {method} {date}")
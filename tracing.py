@@ -0,0 +1,179 @@
+"""
+Lightweight stage timing.
+
+`span(name)` works as a context manager or decorator. Spans nest per
+thread under the trace started by `begin_trace`, which the dashboard
+calls at the top of every rerun, and every finished span also feeds a
+process-wide latency histogram. `count` keeps simple counters such as
+cache lookups and misses. Both can be exported as Prometheus text or JSON.
+"""
+import functools
+import threading
+import time
+from collections import defaultdict
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}
+_counters = defaultdict(int)
+
+
+class Span:
+    """One timed stage; children are the spans opened while it was active"""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+        self.duration = None
+        self.children = []
+
+    def __enter__(self):
+        stack = _stack()
+        if stack:
+            stack[-1].children.append(self)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        _observe(self.name, self.duration)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(self.name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'ms': None if self.duration is None else round(self.duration * 1000, 3),
+            'children': [child.to_dict() for child in self.children],
+        }
+
+    def format(self, indent=0):
+        """Indented text rendering of the span tree"""
+        if self.duration is None:
+            ms = (time.perf_counter() - self.start) * 1000 if self.start else 0.0
+            label = f"{ms:9.1f} ms*"
+        else:
+            label = f"{self.duration * 1000:9.1f} ms "
+        lines = [f"{label} {'  ' * indent}{self.name}"]
+        for child in self.children:
+            lines.append(child.format(indent + 1))
+        return '\n'.join(lines)
+
+
+def span(name):
+    """Time a block (`with span('fetch'):`) or every call of a function (`@span('fetch')`)"""
+    return Span(name)
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def begin_trace(name='rerun'):
+    """Start a new span tree for this thread and return its root"""
+    root = Span(name)
+    _local.stack = []
+    _local.root = root
+    root.__enter__()
+    return root
+
+
+def current_trace():
+    """Root span of the trace running on this thread, or None"""
+    return getattr(_local, 'root', None)
+
+
+def _observe(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = {'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram['buckets'][i] += 1
+                break
+        histogram['count'] += 1
+        histogram['sum'] += seconds
+
+
+def count(name, value=1, **labels):
+    """Increment a counter, e.g. count('cache_misses_total', cache='indicators')"""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += value
+
+
+def metrics_json():
+    """Snapshot of histograms and counters as a JSON-serialisable dict"""
+    with _lock:
+        histograms = {
+            name: {
+                'count': h['count'],
+                'sum_seconds': h['sum'],
+                'buckets': {('+Inf' if b == float('inf') else str(b)): n
+                            for b, n in zip(BUCKETS, h['buckets'])},
+            }
+            for name, h in _histograms.items()
+        }
+        counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in _counters.items()]
+    return {'stage_seconds': histograms, 'counters': counters, 'cache_hit_rates': _hit_rates(counters)}
+
+
+def _hit_rates(counters):
+    """Hit rate per cache from cache_lookups_total and cache_misses_total"""
+    lookups = defaultdict(int)
+    misses = defaultdict(int)
+    for c in counters:
+        cache = c['labels'].get('cache')
+        if c['name'] == 'cache_lookups_total':
+            lookups[cache] += c['value']
+        elif c['name'] == 'cache_misses_total':
+            misses[cache] += c['value']
+    return {cache: 1 - misses[cache] / n for cache, n in lookups.items() if n}
+
+
+def metrics_text():
+    """Prometheus text exposition of the same data"""
+    snapshot = metrics_json()
+    lines = ['# TYPE stage_seconds histogram']
+    for name, h in sorted(snapshot['stage_seconds'].items()):
+        cumulative = 0
+        for bound, n in h['buckets'].items():
+            cumulative += n
+            lines.append(f'stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'stage_seconds_sum{{stage="{name}"}} {h["sum_seconds"]:.6f}')
+        lines.append(f'stage_seconds_count{{stage="{name}"}} {h["count"]}')
+    seen = set()
+    for c in sorted(snapshot['counters'], key=lambda c: c['name']):
+        if c['name'] not in seen:
+            lines.append(f"# TYPE {c['name']} counter")
+            seen.add(c['name'])
+        labels = ','.join(f'{k}="{v}"' for k, v in sorted(c['labels'].items()))
+        lines.append(f"{c['name']}{{{labels}}} {c['value']}")
+    lines.append('# TYPE cache_hit_ratio gauge')
+    for cache, rate in sorted(snapshot['cache_hit_rates'].items()):
+        lines.append(f'cache_hit_ratio{{cache="{cache}"}} {rate:.4f}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Clear all histograms and counters"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
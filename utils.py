@@ -1,146 +1,575 @@
-import yfinance as yf
+import os
 import pandas as pd
 import numpy as np
+import time
+import threading
 from datetime import datetime, timedelta
-from database import get_session, StockPrice, StockInfo, init_db
-from sqlalchemy import and_
+import indicators
+from tracing import span, count
+from datacache import get_cache
+from symbols import get_symbol_index
+from providers import get_provider, storage_key, readjusted, resample_bars, PERIOD_DAYS, INTERVAL_MINUTES
 
-# Initialize database on module import
-init_db()
+# Float dtype of cached indicator frames; 'float32' halves them again
+INDICATOR_DTYPE = os.environ.get('INDICATOR_DTYPE', 'float64')
+
+# Stored history may start this many days after the period start (weekends, holidays);
+# shorter periods allow a third of their length, so a 1d intraday window never passes for 5d
+HEAD_GAP_DAYS = 7
+# Minimum seconds between tail refreshes of the same symbol
+TAIL_REFRESH_SECONDS = 300
+_last_sync = {}
+_covered_from = {}
+
+# Company metadata older than INFO_TTL_HOURS (default 24) is refreshed in the background
+INFO_TTL = timedelta(hours=float(os.environ.get('INFO_TTL_HOURS', 24)))
+_info_refreshing = set()
+_info_lock = threading.Lock()
+
+# Bar sizes offered by the dashboard
+INTERVALS = ['1d', '1h', '15m', '5m', '1m']
+# Finest intraday bars Yahoo serves for a lookback of up to N calendar days.
+# Intraday history is stored once at this granularity and rolled up on read.
+INTRADAY_SOURCES = [('1m', 30), ('5m', 60), ('1h', 730)]
+
+def _db():
+    """
+    The database module. SQLAlchemy is only imported, and the tables only
+    created, when something first needs the database
+    """
+    import database
+    database.ensure_db()
+    return database
 
 def get_nse_symbols():
     """
-    Get list of NSE symbols and company names
+    Get list of NSE symbols and company names from the local listing index
     Returns a dictionary of symbol: company_name pairs
     """
-    nse_symbols = {
-        'RELIANCE.NS': 'Reliance Industries Ltd.',
-        'TCS.NS': 'Tata Consultancy Services Ltd.',
-        'HDFCBANK.NS': 'HDFC Bank Ltd.',
-        'INFY.NS': 'Infosys Ltd.',
-        'HINDUNILVR.NS': 'Hindustan Unilever Ltd.',
-        'ICICIBANK.NS': 'ICICI Bank Ltd.',
-        'BHARTIARTL.NS': 'Bharti Airtel Ltd.',
-        'SBIN.NS': 'State Bank of India',
-        'WIPRO.NS': 'Wipro Ltd.',
-        'AXISBANK.NS': 'Axis Bank Ltd.',
-        'ASIANPAINT.NS': 'Asian Paints Ltd.',
-        'MARUTI.NS': 'Maruti Suzuki India Ltd.',
-        'KOTAKBANK.NS': 'Kotak Mahindra Bank Ltd.',
-        'NESTLEIND.NS': 'Nestle India Ltd.',
-        'LT.NS': 'Larsen & Toubro Ltd.',
-        'TATAMOTORS.NS': 'Tata Motors Ltd.',
-        'BAJFINANCE.NS': 'Bajaj Finance Ltd.',
-        'TITAN.NS': 'Titan Company Ltd.',
-        'TECHM.NS': 'Tech Mahindra Ltd.',
-        'HCLTECH.NS': 'HCL Technologies Ltd.'
-    }
-    return nse_symbols
-
-def get_stock_data(symbol, period='1y'):
-    """
-    Fetch stock data from Yahoo Finance
+    return {f"{listing.symbol}.NS": listing.name for listing in get_symbol_index()}
+
+def cli_symbols(names):
+    """
+    NSE tickers for symbols given on a command line, with or without .NS;
+    the whole listing when none are given
+    """
+    if not names:
+        return list(get_nse_symbols())
+    return [name.upper() if name.upper().endswith('.NS') else f"{name.upper()}.NS" for name in names]
+
+def _period_start(period, interval='1d'):
+    """
+    First calendar date covered by a yfinance period string, None for 'max'.
+    Intraday periods are cut to the lookback Yahoo serves for `interval`
+    """
+    days = _period_days(period, interval)
+    if days is None:
+        return None
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=days)
+
+def _period_days(period, interval='1d'):
+    """Calendar days of `period` that can be fetched at `interval`"""
+    days = PERIOD_DAYS.get(period)
+    limit = dict(INTRADAY_SOURCES).get(interval)
+    if days is not None and limit is not None and days > limit:
+        # The limit counts back from now, not from midnight
+        return limit - 1
+    return days
+
+def head_gap_days(period):
+    """Days the first stored bar may lie after the start of `period`"""
+    days = PERIOD_DAYS.get(period)
+    if days is None:
+        return HEAD_GAP_DAYS
+    return min(HEAD_GAP_DAYS, days / 3)
+
+def source_interval(interval, period):
+    """Stored bar size that `interval` bars over `period` are built from"""
+    if interval == '1d':
+        return '1d'
+    days = PERIOD_DAYS.get(period)
+    if days is not None:
+        # The coarsest source covers longer periods with as much as Yahoo keeps
+        days = min(days, INTRADAY_SOURCES[-1][1])
+    for source, max_days in INTRADAY_SOURCES:
+        if days is not None and days <= max_days and INTERVAL_MINUTES[source] <= INTERVAL_MINUTES[interval]:
+            return source
+    raise ValueError(f"{interval} bars are not available for a {period} period")
+
+def interval_periods(interval):
+    """Periods the dashboard offers for `interval`"""
+    if interval == '1d':
+        return ['1mo', '3mo', '6mo', '1y', '2y', '5y']
+    periods = []
+    for period in ['1d', '5d', '1mo', '3mo', '6mo', '1y', '2y']:
+        try:
+            source_interval(interval, period)
+        except ValueError:
+            continue
+        periods.append(period)
+    return periods
+
+@span('get_stock_data')
+def get_stock_data(symbol, period='1y', interval='1d'):
+    """
+    Fetch stock data, serving stored bars from the database first and
+    only downloading the missing range from the market data provider
     """
     try:
-        # Fetch from Yahoo Finance
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period=period)
-        info = stock.info
+        hist = _cached_history(symbol, period, interval)
+        info = get_stock_info(symbol)
+        if hist is None or hist.empty:
+            return None, info, None
+        # Live price comes from the latest bar so the page never waits on .info
+        info['regularMarketPrice'] = float(hist['Close'].iloc[-1])
         return hist, info, None
     except Exception as e:
         return None, None, str(e)
 
+def _cached_history(symbol, period, interval='1d'):
+    """
+    `_load_history` through the process-wide cache, so sessions asking for the
+    same bars at the same time share one database read and download
+    """
+    key = ('history', storage_key(symbol, get_provider()), period, interval)
+    return get_cache().get_or_load(key, lambda: _load_history(symbol, period, interval),
+                                   ttl=TAIL_REFRESH_SECONDS)
+
+def _load_history(symbol, period, interval='1d'):
+    """Bars for `symbol` over `period`, read through the database cache"""
+    provider = get_provider()
+    source = source_interval(interval, period)
+    key = storage_key(symbol, provider)
+    if source != '1d':
+        key = f"{key}@{source}"
+    start = _period_start(period, source)
+    with span('price_store.load'):
+        cached = _db().get_price_store().load_prices(key, start) if start is not None else None
+    hist = _sync_prices(symbol, key, provider, period, start, cached, source)
+    if interval == source or hist.empty:
+        return hist
+    return _resampled(key, period, interval, hist)
+
+def _resampled(key, period, interval, hist):
+    """`hist` rolled up to `interval`, cached until its last source bar changes"""
+    def load():
+        with span('resample'):
+            return resample_bars(hist, interval)
+    return get_cache().get_or_load(('resample', key, period, interval) + bar_version(hist), load)
+
+def _sync_prices(symbol, key, provider, period, start, cached, interval='1d'):
+    """
+    Bring the bars stored under `key` up to date and return those since `start`.
+    The whole period is downloaded only when the stored range does not reach
+    back far enough, or when the provider has re-adjusted past daily bars for
+    a split or dividend; otherwise just the tail from the last stored bar is fetched.
+    """
+    now = time.monotonic()
+    count('cache_lookups_total', cache='price_store')
+    if not _has_head(key, period, start, cached):
+        count('cache_misses_total', cache='price_store')
+        return _download(symbol, key, provider, period, start, interval, now)
+
+    if not _tail_due(key, now):
+        return cached
+
+    try:
+        with span('provider.tail'):
+            tail = provider.history(symbol, start=_tail_start(cached), interval=interval)
+    except Exception:
+        # Serve what we have rather than failing the whole page
+        return cached
+    if interval == '1d' and readjusted(cached, tail):
+        count('price_readjustments_total')
+        return _download(symbol, key, provider, period, start, interval, now, replace=True)
+    return _store_tail(key, cached, tail, now)
+
+def _has_head(key, period, start, cached):
+    """True when the stored bars in `cached` reach back to the start of `period`"""
+    covered_from = _covered_from.get(key)
+    return cached is not None and not cached.empty and (
+        cached.index[0] <= start + timedelta(days=head_gap_days(period))
+        or (covered_from is not None and covered_from <= start))
+
+def _tail_due(key, now):
+    return now - _last_sync.get(key, float('-inf')) >= TAIL_REFRESH_SECONDS
+
+def _tail_start(cached):
+    """
+    Re-fetch the last stored bar as well, it may have been a partial session,
+    and the completed one before it to notice re-adjusted history
+    """
+    return cached.index[max(len(cached) - 2, 0)].strftime('%Y-%m-%d')
+
+def _download_range(period, start, interval):
+    """history() arguments for the whole of `period`, cut to what Yahoo keeps at `interval`"""
+    if _period_days(period, interval) != PERIOD_DAYS.get(period):
+        return {'start': start.strftime('%Y-%m-%d')}
+    return {'period': period}
+
+def _download(symbol, key, provider, period, start, interval, now, replace=False):
+    """
+    Fetch the whole period and store it under `key`. With `replace` the stored
+    bars are dropped first, so none keep an outdated adjustment basis
+    """
+    with span('provider.history'):
+        hist = provider.history(symbol, interval=interval, **_download_range(period, start, interval))
+    return _store_download(key, hist, start, now, replace)
+
+def _store_download(key, hist, start, now, replace=False):
+    store = _db().get_price_store()
+    with span('price_store.upsert'):
+        if replace:
+            store.replace_prices(key, hist)
+        else:
+            store.upsert_prices(key, hist)
+    if replace:
+        _covered_from.pop(key, None)
+    if start is not None and (key not in _covered_from or start < _covered_from[key]):
+        _covered_from[key] = start
+    _last_sync[key] = now
+    return hist
+
+def _store_tail(key, cached, tail, now):
+    with span('price_store.upsert'):
+        _db().get_price_store().upsert_prices(key, tail)
+    _last_sync[key] = now
+    if tail.empty:
+        return cached
+    return pd.concat([cached[cached.index < tail.index[0]], tail])
+
+@span('get_histories')
+def get_histories(symbols, period='1y'):
+    """
+    Load daily bars for many symbols. Downloads go out together through
+    `_prefetch_histories`, after which each symbol is read from the database.
+    Returns (frames, errors): dicts of symbol -> DataFrame, in the order of
+    `symbols`, and symbol -> error message.
+    """
+    frames = {}
+    if not symbols:
+        return frames, {}
+    errors, stale = _prefetch_histories(symbols, period)
+    for symbol in symbols:
+        if symbol in errors:
+            continue
+        try:
+            hist = stale[symbol] if symbol in stale else _cached_history(symbol, period)
+        except Exception as e:
+            errors[symbol] = str(e)
+            continue
+        if hist is None or hist.empty:
+            errors[symbol] = "No data found"
+        else:
+            frames[symbol] = hist
+    return frames, errors
+
+def _prefetch_histories(symbols, period):
+    """
+    Bring the stored daily bars of every symbol not in the shared cache up to
+    date, with one batched provider request for the full downloads and one
+    per tail start date, as `_sync_prices` would do for each of them.
+    Returns (errors, stale): symbol -> message for failed downloads, and
+    symbol -> stored bars for failed tail refreshes, which are served as they are.
+    """
+    provider = get_provider()
+    start = _period_start(period)
+    store = _db().get_price_store()
+    now = time.monotonic()
+    downloads = []
+    tails = {}
+    with span('price_store.load'):
+        for symbol in symbols:
+            key = storage_key(symbol, provider)
+            if get_cache().contains(('history', key, period, '1d')):
+                continue
+            cached = store.load_prices(key, start) if start is not None else None
+            count('cache_lookups_total', cache='price_store')
+            if not _has_head(key, period, start, cached):
+                count('cache_misses_total', cache='price_store')
+                downloads.append(symbol)
+            elif _tail_due(key, now):
+                tails.setdefault(_tail_start(cached), {})[symbol] = cached
+
+    stale = {}
+    replace = set()
+    for tail_start, group in tails.items():
+        with span('provider.tail'):
+            frames, _ = provider.histories(list(group), start=tail_start)
+        for symbol, cached in group.items():
+            if symbol not in frames:
+                stale[symbol] = cached
+            elif readjusted(cached, frames[symbol]):
+                count('price_readjustments_total')
+                replace.add(symbol)
+            else:
+                _store_tail(storage_key(symbol, provider), cached, frames[symbol], now)
+
+    errors = {}
+    if downloads or replace:
+        with span('provider.history'):
+            frames, errors = provider.histories(downloads + sorted(replace), **_download_range(period, start, '1d'))
+        for symbol, hist in frames.items():
+            _store_download(storage_key(symbol, provider), hist, start, now, replace=symbol in replace)
+    return errors, stale
+
+@span('get_watchlist_data')
+def get_watchlist_data(symbols, period='3mo'):
+    """
+    Load many symbols in one batch and summarise each one.
+    Returns (summary, errors): a DataFrame indexed by symbol with last price,
+    change %, RSI and supertrend side, and a dict of symbol -> error message.
+    """
+    frames, errors = get_histories(symbols, period)
+    rows = []
+    for symbol, hist in frames.items():
+        df = get_indicators(symbol, period, hist)
+        last = df.iloc[-1]
+        prev_close = df['Close'].iloc[-2] if len(df) > 1 else np.nan
+        rows.append({
+            'Symbol': symbol.replace('.NS', ''),
+            'Last Price': last['Close'],
+            'Change %': (last['Close'] / prev_close - 1) * 100,
+            'RSI': last['RSI'],
+            'Supertrend': last['supertrend'],
+            'Trend': 'Bullish' if last['Close'] > last['supertrend'] else 'Bearish',
+        })
+
+    summary = pd.DataFrame(rows, columns=['Symbol', 'Last Price', 'Change %', 'RSI', 'Supertrend', 'Trend'])
+    summary = summary.set_index('Symbol')
+    return summary.round(2), errors
+
+def get_stock_info(symbol, ttl=INFO_TTL):
+    """
+    Return company metadata from the StockInfo table without blocking.
+    Missing or stale rows are served as-is while a background refresh runs.
+    """
+    provider = get_provider()
+    key = storage_key(symbol, provider)
+    info = _db().load_info(key)
+    last_updated = info.get('last_updated') if info else None
+    count('cache_lookups_total', cache='stock_info')
+    if last_updated is None or datetime.utcnow() - last_updated > ttl:
+        count('cache_misses_total', cache='stock_info')
+        _refresh_info_async(symbol, key, provider)
+    return info or {}
+
+def _refresh_info_async(symbol, key, provider):
+    """Start a background download of the provider's info, at most one per symbol"""
+    with _info_lock:
+        if key in _info_refreshing:
+            return
+        _info_refreshing.add(key)
+    threading.Thread(target=_refresh_info, args=(symbol, key, provider), daemon=True).start()
+
+def _refresh_info(symbol, key, provider):
+    try:
+        info = provider.info(symbol)
+        if info:
+            _db().save_info(key, info)
+    except Exception:
+        # Keep serving the stale row; the next request will retry
+        pass
+    finally:
+        with _info_lock:
+            _info_refreshing.discard(key)
+
 def get_tradingview_symbol(symbol):
     """Convert Yahoo Finance symbol to TradingView format"""
     return f"NSE:{symbol.replace('.NS', '')}"
 
-def calculate_indicators(df):
-    """Calculate technical indicators"""
-    # 20-day Moving Average
-    df['MA20'] = df['Close'].rolling(window=20).mean()
-
-    # Relative Strength Index (14-day)
-    delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-
-    # Supertrend (10,3)
-    period = 10
-    multiplier = 3
-
-    # Calculate True Range
-    df['tr0'] = abs(df['High'] - df['Low'])
-    df['tr1'] = abs(df['High'] - df['Close'].shift(1))
-    df['tr2'] = abs(df['Low'] - df['Close'].shift(1))
-    df['tr'] = df[['tr0', 'tr1', 'tr2']].max(axis=1)
-    df['atr'] = df['tr'].rolling(period).mean()
-
-    # Calculate basic bands
-    hl2 = (df['High'] + df['Low']) / 2
-
-    # Basic Upper and Lower Bands
-    df['basic_ub'] = hl2 + (multiplier * df['atr'])
-    df['basic_lb'] = hl2 - (multiplier * df['atr'])
-
-    # Final Upper and Lower Bands
-    df['final_ub'] = 0.00
-    df['final_lb'] = 0.00
-    for i in range(period, len(df)):
-        df['final_ub'].iat[i] = df['basic_ub'].iat[i] if df['basic_ub'].iat[i] < df['final_ub'].iat[i - 1] or df['Close'].iat[i - 1] > df['final_ub'].iat[i - 1] else df['final_ub'].iat[i - 1]
-        df['final_lb'].iat[i] = df['basic_lb'].iat[i] if df['basic_lb'].iat[i] > df['final_lb'].iat[i - 1] or df['Close'].iat[i - 1] < df['final_lb'].iat[i - 1] else df['final_lb'].iat[i - 1]
-
-    # Supertrend
-    df['supertrend'] = 0.00
-    for i in range(period, len(df)):
-        if df['Close'].iat[i] <= df['final_ub'].iat[i]:
-            df['supertrend'].iat[i] = df['final_ub'].iat[i]
-        else:
-            df['supertrend'].iat[i] = df['final_lb'].iat[i]
+@span('calculate_indicators')
+def calculate_indicators(df, lean=False, dtype=None):
+    """
+    Calculate technical indicators.
+    By default every indicator and scratch column is added to `df` in place.
+    With lean=True `df` is left untouched and a new frame holding its price
+    columns plus MA20, RSI and supertrend is returned; intermediates only
+    live as long as the calculation. `dtype='float32'` then also stores
+    prices as float32 and volume as int32 when it fits.
+    """
+    pipeline = indicators.IndicatorPipeline(df['High'], df['Low'], df['Close'])
+    if not lean:
+        for column, values in pipeline.columns().items():
+            df[column] = values
+        return df
+    dtype = np.dtype(dtype or 'float64')
+    return _lean_frame(df, pipeline.columns(indicators.LEAN_COLUMNS, dtype), dtype)
 
-    return df
+def _lean_frame(df, indicator_columns, dtype):
+    """Price columns of `df` plus `indicator_columns`, stored as `dtype`"""
+    columns = {}
+    for column in df.columns:
+        if column in indicators.PUBLISHED_COLUMNS:
+            continue
+        values = df[column].to_numpy()
+        if values.dtype.kind == 'f':
+            values = values.astype(dtype, copy=False)
+        elif values.dtype.kind in 'iu' and dtype.itemsize < 8 and _fits_int32(values):
+            values = values.astype(np.int32)
+        columns[column] = values
+    for column, values in indicator_columns.items():
+        columns[column] = np.asarray(values, dtype=dtype)
+    return pd.DataFrame(columns, index=df.index)
 
-def calculate_pivot_points(hist):
+def _fits_int32(values):
+    limits = np.iinfo(np.int32)
+    return len(values) == 0 or (values.min() >= limits.min and values.max() <= limits.max)
+
+def bar_version(hist):
+    """
+    Identifies a history by its length and last bar, values included: the last
+    bar may be a session in progress whose prices change under the same date
+    """
+    if not len(hist):
+        return (None, 0)
+    last = hist.iloc[-1]
+    return (hist.index[-1], len(hist)) + tuple(float(last[column]) for column in ('Open', 'High', 'Low', 'Close', 'Volume'))
+
+def get_indicators(symbol, period, hist):
+    """
+    Return `hist` with indicators, computed once per (symbol, period, last bar).
+    Daily values come from the rows materialize.py stored when they cover `hist`.
+    Cached frames are lean (see calculate_indicators) and stored as INDICATOR_DTYPE
+    """
+    def load():
+        # Intraday periods look like '5d@15m'; only daily bars are materialized
+        if len(hist) and '@' not in period:
+            count('cache_lookups_total', cache='materialized')
+            derived = _materialized_indicators(symbol, hist)
+            if derived is not None:
+                return _lean_frame(hist, derived, np.dtype(INDICATOR_DTYPE))
+            count('cache_misses_total', cache='materialized')
+        return calculate_indicators(hist, lean=True, dtype=INDICATOR_DTYPE)
+    key = ('indicators', symbol, period) + bar_version(hist)
+    return get_cache().get_or_load(key, load)
+
+def _materialized_indicators(symbol, hist):
+    """
+    MA20, RSI and supertrend for daily `hist` from the daily_indicators table.
+    Bars after the one the saved state was taken at (the last materialized bar,
+    which may since have been revised, and today's session) are advanced from
+    that state. None when the table or state does not cover `hist`.
+    Materialized values start from the whole stored history (see materialize.py).
+    """
+    key = storage_key(symbol, get_provider())
+    last_date, state = _db().load_derived_state(key)
+    if state is None:
+        return None
+    last = pd.Timestamp(last_date)
+    if last not in hist.index or state['prev_close'] != float(hist.at[last, 'Close']):
+        return None
+    with span('derived.load'):
+        derived = _db().load_derived_indicators(key, hist.index[0], last)
+    if not derived.index.equals(hist.index[hist.index <= last]):
+        return None
+    tail = hist[hist.index > last]
+    if len(tail):
+        live = indicators.IncrementalIndicators.from_state(state)
+        rows = [live.update(bar) for bar in tail[['High', 'Low', 'Close']].to_dict('records')]
+        derived = pd.concat([derived, pd.DataFrame(rows, index=tail.index)[indicators.LEAN_COLUMNS]])
+    return {column: derived[column].to_numpy() for column in indicators.LEAN_COLUMNS}
+
+def get_live_indicators(symbol, hist):
+    """
+    Bring the stored streaming state for `symbol` up to the last bar of `hist`.
+    The snapshot is kept one bar behind: the last bar may be a session still in
+    progress, so it is applied on top of the snapshot on every call and a revised
+    close is picked up. Without a snapshot matching `hist` the state is seeded
+    from the history. Returns the IncrementalIndicators.
+    """
+    key = storage_key(symbol, get_provider())
+    completed = hist.iloc[:-1]
+    last_date, state = _db().load_indicator_state(key)
+    if (state is None or last_date not in completed.index
+            or state['prev_close'] != float(completed.at[last_date, 'Close'])):
+        live = indicators.IncrementalIndicators.from_history(completed['High'], completed['Low'], completed['Close'])
+    else:
+        live = indicators.IncrementalIndicators.from_state(state)
+        for bar in completed[completed.index > last_date].to_dict('records'):
+            live.update(bar)
+    if len(completed):
+        _db().save_indicator_state(key, completed.index[-1].to_pydatetime(), live.to_state())
+    if len(hist):
+        live.update(hist.iloc[-1])
+    return live
+
+def resample_ohlcv(df, rule):
+    """Roll OHLCV bars up to a coarser pandas frequency (e.g. 'W', 'ME')"""
+    bars = df[['Open', 'High', 'Low', 'Close', 'Volume']].resample(rule).agg({
+        'Open': 'first',
+        'High': 'max',
+        'Low': 'min',
+        'Close': 'last',
+        'Volume': 'sum',
+    })
+    # Buckets without any trades (weekends, holidays) come back empty
+    return bars.dropna(subset=['Close'])
+
+@span('calculate_pivot_points')
+def calculate_pivot_points(hist, method='classic'):
     """Calculate Pivot Points and Support/Resistance levels"""
     latest = hist.iloc[-1]
-    high = latest['High']
-    low = latest['Low']
-    close = latest['Close']
-
-    pivot = (high + low + close) / 3
-
-    r1 = (2 * pivot) - low
-    r2 = pivot + (high - low)
-    r3 = high + 2 * (pivot - low)
-    r4 = r3 + (high - low)
-
-    s1 = (2 * pivot) - high
-    s2 = pivot - (high - low)
-    s3 = low - 2 * (high - pivot)
-    s4 = s3 - (high - low)
-
-    return {
-        'Pivot Point': round(pivot, 2),
-        'Resistance 1': round(r1, 2),
-        'Resistance 2': round(r2, 2),
-        'Resistance 3': round(r3, 2),
-        'Resistance 4': round(r4, 2),
-        'Support 1': round(s1, 2),
-        'Support 2': round(s2, 2),
-        'Support 3': round(s3, 2),
-        'Support 4': round(s4, 2)
-    }
+    levels = indicators.pivot_levels(latest['High'], latest['Low'], latest['Close'], method)
+    return {name: round(float(value), 2) for name, value in levels.items()}
+
+def get_pivot_points(symbol, hist, method='classic'):
+    """
+    calculate_pivot_points for daily `hist`, read from pivot_levels when materialize.py
+    stored them. Stored levels are only used while they match hist's last bar: they
+    may come from a session that was still trading, or from bars since re-adjusted
+    """
+    with span('derived.load'):
+        levels = _db().load_pivot_levels(storage_key(symbol, get_provider()), method, hist.index[-1])
+    expected = calculate_pivot_points(hist, method)
+    if levels is None:
+        return expected
+    stored = {name: round(float(value), 2) for name, value in levels.items()}
+    if stored != expected:
+        count('cache_misses_total', cache='materialized')
+        return expected
+    return stored
+
+# Bar size each pivot timeframe is derived from
+PIVOT_TIMEFRAMES = {'daily': 'D', 'weekly': 'W', 'monthly': 'ME'}
+
+@span('pivot_series')
+def pivot_series(hist, method='classic', timeframe='daily'):
+    """
+    Historical pivot levels for every bar of `hist`.
+    Each bar carries the levels of the previous completed day, week or month,
+    i.e. the ones a trader would have drawn before that bar; bars in the first
+    period are NaN. Returns a DataFrame indexed like `hist` with the
+    calculate_pivot_points level names as columns.
+    """
+    periods = resample_ohlcv(hist, PIVOT_TIMEFRAMES[timeframe])
+    levels = indicators.pivot_levels(periods['High'].to_numpy(), periods['Low'].to_numpy(),
+                                     periods['Close'].to_numpy(), method)
+    # Period labels are the period's first day ('D') or last day ('W', 'ME'); the
+    # last label strictly before a bar's date is the previous completed period
+    source = np.searchsorted(periods.index.asi8, hist.index.normalize().asi8, side='left') - 1
+    valid = source >= 0
+    columns = {}
+    for name, values in levels.items():
+        column = np.full(len(hist), np.nan)
+        column[valid] = values[source[valid]]
+        columns[name] = column
+    return pd.DataFrame(columns, index=hist.index)
 
+@span('format_table_data')
 def format_table_data(hist):
     """
     Format historical data for table display
     """
-    df = hist.copy()
-    df = calculate_indicators(df)
+    if 'supertrend' not in hist.columns:
+        hist = calculate_indicators(hist, lean=True)
+    df = hist.round(2)
     if hasattr(df.index, 'strftime'):
-        df.index = df.index.strftime('%Y-%m-%d')
-    df = df.round(2)
+        # NumPy's ISO formatting is several times faster than strftime on long intraday frames
+        intraday = bool((df.index != df.index.normalize()).any())
+        labels = df.index.values.astype('datetime64[m]' if intraday else 'datetime64[D]').astype(str)
+        df.index = pd.Index(np.char.replace(labels, 'T', ' ') if intraday else labels, name=df.index.name)
     # Sort by date in descending order (newest first)
     df = df.sort_index(ascending=False)
     return df
\ No newline at end of file